@@ -0,0 +1,49 @@
+from collections import OrderedDict
+
+###
+### A bounded memo table for the search.  Entries are evicted least recently
+### used first, and we count hits and misses so we can tell if it's earning
+### its keep.
+
+class LRUCache(object):
+    """Mapping of bounded size that forgets the least recently used keys."""
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+
+    def get(self, key, default = None):
+        """Return the value for key, or default; counts a hit or a miss."""
+        try:
+            value = self._data.pop(key)
+        except KeyError:
+            self.misses += 1
+            return default
+        self._data[key] = value # now the most recently used
+        self.hits += 1
+        return value
+
+    def __setitem__(self, key, value):
+        self._data.pop(key, None)
+        self._data[key] = value
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last = False)
+
+    def __contains__(self, key): return key in self._data
+
+    def __len__(self): return len(self._data)
+
+    def clear(self):
+        self._data.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def hitRate(self):
+        lookups = self.hits + self.misses
+        return self.hits / float(lookups) if lookups else 0
+
+    def __repr__(self):
+        return ("LRUCache(%d/%d entries, %d hits, %d misses)"
+                % (len(self._data), self.maxsize, self.hits, self.misses))
@@ -6,29 +6,27 @@ import itertools
 ### I removed a number of functions that I want to avoid ever using.
 
 class LinkedList(object):
-    """Immutable linked list class."""
+    """Immutable linked list class.  Each cell knows the length of the list
+    it starts, so len() is constant time."""
+
+    __slots__ = ('_head', '_tail', '_len')
 
     def __new__(cls, l=[]):
         if isinstance(l, LinkedList): return l # Immutable, so no copy needed.
-        i = iter(l)
-        try:
-            head = i.next()
-        except StopIteration:
-            return cls.nil   # Return empty list singleton.
-
-        tail = LinkedList(i)
-
-        obj = super(LinkedList, cls).__new__(cls)
-        obj._head = head
-        obj._tail = tail
-        return obj
+        # Build from the back, so deep lists don't recurse.
+        ll = cls.nil   # The empty list singleton.
+        for head in reversed(list(l)):
+            ll = cls.cons(head, ll)
+        return ll
 
     @classmethod
     def cons(cls, head, tail):
-        ll =  cls([head])
-        if not isinstance(tail, cls):
+        if not isinstance(tail, LinkedList):
             tail = cls(tail)
+        ll = object.__new__(cls)
+        ll._head = head
         ll._tail = tail
+        ll._len = tail._len + 1
         return ll
 
     # head and tail are not modifiable
@@ -41,19 +39,26 @@ class LinkedList(object):
     def __nonzero__(self): return True
 
     def __len__(self):
-        return sum(1 for _ in self)
+        return self._len
 
     def __iter__(self):
-        x=self
-        while x:
-            yield x.head
-            x=x.tail
+        x = self
+        for _ in xrange(self._len):
+            yield x._head
+            x = x._tail
 
     def __repr__(self):
         return "LinkedList([%s])" % ', '.join(map(repr,self))
 
+    # Pickle as a plain list; __new__ rebuilds the cells (or the nil
+    # singleton) on the other side.
+    def __reduce__(self):
+        return (LinkedList, (list(self),))
+
 class EmptyList(LinkedList):
     """A singleton representing an empty list."""
+    __slots__ = ()
+
     def __new__(cls):
         return object.__new__(cls)
 
@@ -68,6 +73,7 @@ class EmptyList(LinkedList):
 
 # Create EmptyList singleton
 LinkedList.nil = EmptyList()
+LinkedList.nil._len = 0
 del EmptyList
 
 nil = LinkedList.nil
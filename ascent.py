@@ -17,10 +17,18 @@
 from __future__ import division
 
 import math
-from math import cos, sin, sqrt
+from array import array
+from bisect import bisect_left
+from math import cos, sin, sqrt, exp
 
 import physics
 from physics import L2
+from planet import gamma
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
 
 
 def angles(p, v):
@@ -52,6 +60,335 @@ def angles(p, v):
 
 class BadFlightPlanException(Exception): pass
 
+# Solve for the thrust that puts the apoapsis on target in closed form (see
+# apoapsisThrust).  Set to False to binary search it as we used to.
+exactApoapsisThrust = True
+
+def apoapsisThrust(px, py, vx, vy, tx, ty, mu, targetApoapsis):
+    """
+    Return the thrust T that puts the apoapsis exactly at targetApoapsis
+    (from the core) once we're going at v + T (tx, ty), from position p.
+    The vectors come in as scalars, so the climb needn't allocate them.
+    Thrust past T sends the apoapsis higher, or the orbit hyperbolic.
+
+    If even zero thrust overshoots, and more only makes it worse, returns 0.
+    Returns None if the closed form doesn't settle it: more thrust could
+    bring the apoapsis back down, or the thrust doesn't push outwards.
+    """
+    # The apsides are the roots r of (see planet.determineOrbit)
+    #       (2/h - |w|^2/mu) r^2 - 2 r + L^2/mu = 0
+    # where h = |p|, and L = p x w is the angular momentum.  Multiply by mu
+    # and set r = R, the target apoapsis:
+    #       f = L^2 - R^2 |w|^2 + 2 mu R (R/h - 1)
+    # is zero when R is an apsis, and negative when R lies between the
+    # periapsis and the apoapsis: the apoapsis is too high.  With w = v + T t,
+    #       L = c0 + c1 T   where c0 = p x v, c1 = p x t
+    # and f is a quadratic in T:
+    #       (c1^2 - R^2 |t|^2) T^2 + 2 (c0 c1 - R^2 v.t) T
+    #               + c0^2 - R^2 |v|^2 + 2 mu R (R/h - 1)
+    # Since |c1| <= h |t| < R |t| the leading term is negative: f is
+    # non-negative between the two roots, and the thrust we want is the
+    # bigger one.
+    R = targetApoapsis
+    h = sqrt(px * px + py * py)
+    c0 = px * vy - py * vx
+    c1 = px * ty - py * tx
+    R2 = R * R
+    a = c1 * c1 - R2 * (tx * tx + ty * ty)
+    b = 2 * (c0 * c1 - R2 * (vx * tx + vy * ty))
+    c = c0 * c0 - R2 * (vx * vx + vy * vy) + 2 * mu * R * (R / h - 1)
+    if a >= 0:
+        return None
+    if c < 0:
+        # We overshoot already.  Unless f peaks at positive thrust, above
+        # zero, thrusting can't help.
+        if b <= 0 or b * b - 4 * a * c < 0:
+            return 0
+        return None
+    # a < 0 <= c, so the discriminant is positive and the roots straddle 0.
+    return (-b - sqrt(b * b - 4 * a * c)) / (2 * a)
+
+def searchApoapsisThrust(planet, targetApoapsis, h, psi, vx, vy, tx, ty,
+        thrust_hi, guess = None):
+    """
+    Binary search for the thrust that puts the apoapsis on target, for when
+    apoapsisThrust can't settle it, or we were told not to use it.  We're
+    at distance h from the core, at angle psi, going at v + T (tx, ty); the
+    thrust is between 0 and thrust_hi, and we try the guess first.
+    """
+    thrust_lo = 0
+    # while we are off by more than 1mm/s, binary search
+    # we waste a bit of time searching for really big solutions.
+    while thrust_hi - thrust_lo > 1e-3:
+        if guess and guess < thrust_hi:
+            thrust = guess
+            guess = None
+        else:
+            thrust = (thrust_hi + thrust_lo) / 2
+        v_next = (vx + thrust * tx, vy + thrust * ty)
+        (apoapsis, _) = planet.determineOrbit3(h, psi, v_next)
+
+        # if apoapsis is too high, or negative (i.e. hyperbolic), reduce thrust
+        if apoapsis > targetApoapsis or apoapsis < 0:
+            thrust_hi = thrust
+        else:
+            thrust_lo = thrust
+    return thrust_lo # or hi, it's only 1mm/s difference
+
+# The Dormand-Prince 5(4) tableau.
+_dpA = (
+    (),
+    (1/5,),
+    (3/40, 9/40),
+    (44/45, -56/15, 32/9),
+    (19372/6561, -25360/2187, 64448/6561, -212/729),
+    (9017/3168, -355/33, 46732/5247, 49/176, -5103/18656),
+    (35/384, 0, 500/1113, 125/192, -2187/6784, 11/84),
+)
+_dpB = (35/384, 0, 500/1113, 125/192, -2187/6784, 11/84, 0)
+_dpE = (71/57600, 0, -71/16695, 71/1920, -17253/339200, 22/525, -1/40)
+
+class climbKernel(object):
+    """
+    The physics of a step of the climb, on scalars.  The planet's constants
+    are looked up once, here, rather than on every call as the planet's own
+    gravity, drag and terminalVelocity do.  The arithmetic is the same as
+    theirs, so the climb comes out the same to the bit.
+    """
+    def __init__(self, planet, dragCoefficient):
+        self.mu = planet.mu
+        self.radius = planet.radius
+        self.scale = planet.scale
+        self.datumPressure = planet.datumPressure
+        self.topOfAtmosphere = planet.topOfAtmosphere()
+        self.dragFactor = gamma * dragCoefficient
+        self.terminalFactor = gamma * dragCoefficient * planet.datumPressure
+
+    def gravity(self, altitude):
+        r = self.radius + altitude
+        return self.mu / (r*r)
+
+    def drag(self, altitude, speed):
+        if altitude >= self.topOfAtmosphere: return 0
+        return (self.dragFactor * (self.datumPressure * exp(-altitude / self.scale))
+                * (speed ** 2))
+
+    def terminalVelocity(self, altitude):
+        if altitude >= self.topOfAtmosphere: return float("inf")
+        return exp(0.5 * altitude / self.scale) * sqrt(
+                    self.gravity(altitude) / self.terminalFactor)
+
+    def rk4(self, px, py, vx, vy, dt, tx, ty, dragX, dragY, gravX, gravY):
+        """
+        Take one RK4 step of dt from position p and velocity v, under
+        thrust (tx, ty).  Drag pulls back along (dragX, dragY) and gravity
+        along (gravX, gravY); the directions are held for the step, the
+        strengths follow the altitude and speed.  Returns the new position
+        and velocity, as px, py, vx, vy.
+        """
+        # Each stage computes the altitude, gravity and drag once, inline.
+        radius = self.radius
+        mu = self.mu
+        TOA = self.topOfAtmosphere
+        dragFactor = self.dragFactor
+        datumPressure = self.datumPressure
+        scale = self.scale
+
+        altitude = sqrt(px ** 2 + py ** 2) - radius
+        r = radius + altitude
+        ag = mu / (r*r)
+        ad = 0 if altitude >= TOA else (dragFactor * (datumPressure
+                * exp(-altitude / scale)) * (sqrt(vx ** 2 + vy ** 2) ** 2))
+        dv1x = dt * (tx - (ad * dragX + ag * gravX))
+        dv1y = dt * (ty - (ad * dragY + ag * gravY))
+        dx1x = dt * vx
+        dx1y = dt * vy
+
+        sx = px + 0.5 * dx1x
+        sy = py + 0.5 * dx1y
+        svx = vx + 0.5 * dv1x
+        svy = vy + 0.5 * dv1y
+        altitude = sqrt(sx ** 2 + sy ** 2) - radius
+        r = radius + altitude
+        ag = mu / (r*r)
+        ad = 0 if altitude >= TOA else (dragFactor * (datumPressure
+                * exp(-altitude / scale)) * (sqrt(svx ** 2 + svy ** 2) ** 2))
+        dv2x = dt * (tx - (ad * dragX + ag * gravX))
+        dv2y = dt * (ty - (ad * dragY + ag * gravY))
+        dx2x = dt * svx
+        dx2y = dt * svy
+
+        sx = px + 0.5 * dx2x
+        sy = py + 0.5 * dx2y
+        svx = vx + 0.5 * dv2x
+        svy = vy + 0.5 * dv2y
+        altitude = sqrt(sx ** 2 + sy ** 2) - radius
+        r = radius + altitude
+        ag = mu / (r*r)
+        ad = 0 if altitude >= TOA else (dragFactor * (datumPressure
+                * exp(-altitude / scale)) * (sqrt(svx ** 2 + svy ** 2) ** 2))
+        dv3x = dt * (tx - (ad * dragX + ag * gravX))
+        dv3y = dt * (ty - (ad * dragY + ag * gravY))
+        dx3x = dt * svx
+        dx3y = dt * svy
+
+        sx = px + dx3x
+        sy = py + dx3y
+        svx = vx + dv3x
+        svy = vy + dv3y
+        altitude = sqrt(sx ** 2 + sy ** 2) - radius
+        r = radius + altitude
+        ag = mu / (r*r)
+        ad = 0 if altitude >= TOA else (dragFactor * (datumPressure
+                * exp(-altitude / scale)) * (sqrt(svx ** 2 + svy ** 2) ** 2))
+        dv4x = dt * (tx - (ad * dragX + ag * gravX))
+        dv4y = dt * (ty - (ad * dragY + ag * gravY))
+        dx4x = dt * svx
+        dx4y = dt * svy
+
+        sixth = 1.0 / 6.0
+        return (px + sixth * (dx1x + 2 * dx2x + 2 * dx3x + dx4x),
+                py + sixth * (dx1y + 2 * dx2y + 2 * dx3y + dx4y),
+                vx + sixth * (dv1x + 2 * dv2x + 2 * dv3x + dv4x),
+                vy + sixth * (dv1y + 2 * dv2y + 2 * dv3y + dv4y))
+
+    def stateAccel(self, px, py, vx, vy, thrust, steering):
+        """
+        The acceleration at position p and velocity v, for dormandPrince:
+        gravity, drag and the steering(altitude) follow the state; only the
+        thrust is held steady.  Returns ax, ay.
+        """
+        r = sqrt(px * px + py * py)
+        altitude = r - self.radius
+        ag = self.gravity(altitude) / r
+        speed = sqrt(vx * vx + vy * vy)
+        ad = self.drag(altitude, speed) / speed if speed else 0
+        heading = steering(altitude) + math.atan2(py, px)
+        return (thrust * cos(heading) - ag * px - ad * vx,
+                thrust * sin(heading) - ag * py - ad * vy)
+
+    def dormandPrince(self, px, py, vx, vy, dt, thrust, steering):
+        """
+        Take one Dormand-Prince step of dt from position p and velocity v,
+        under the thrust, steered by steering(altitude) (see stateAccel).
+        Returns the new position and velocity, as px, py, vx, vy, and an
+        estimate of the error in them: the larger of the error in position
+        and in velocity.
+        """
+        # The state is (p, v); its derivative is (v, accel).  Stage i is at
+        # position pi and velocity vi, where the acceleration is ai.  The
+        # zeros in the tableau are left out.
+        accel = self.stateAccel
+        (a21,) = _dpA[1]
+        (a31, a32) = _dpA[2]
+        (a41, a42, a43) = _dpA[3]
+        (a51, a52, a53, a54) = _dpA[4]
+        (a61, a62, a63, a64, a65) = _dpA[5]
+        (a71, _, a73, a74, a75, a76) = _dpA[6]
+        (e1, _, e3, e4, e5, e6, e7) = _dpE
+
+        (a1x, a1y) = accel(px, py, vx, vy, thrust, steering)
+
+        p2x = px + dt * a21 * vx
+        p2y = py + dt * a21 * vy
+        v2x = vx + dt * a21 * a1x
+        v2y = vy + dt * a21 * a1y
+        (a2x, a2y) = accel(p2x, p2y, v2x, v2y, thrust, steering)
+
+        p3x = px + dt * a31 * vx + dt * a32 * v2x
+        p3y = py + dt * a31 * vy + dt * a32 * v2y
+        v3x = vx + dt * a31 * a1x + dt * a32 * a2x
+        v3y = vy + dt * a31 * a1y + dt * a32 * a2y
+        (a3x, a3y) = accel(p3x, p3y, v3x, v3y, thrust, steering)
+
+        p4x = px + dt * a41 * vx + dt * a42 * v2x + dt * a43 * v3x
+        p4y = py + dt * a41 * vy + dt * a42 * v2y + dt * a43 * v3y
+        v4x = vx + dt * a41 * a1x + dt * a42 * a2x + dt * a43 * a3x
+        v4y = vy + dt * a41 * a1y + dt * a42 * a2y + dt * a43 * a3y
+        (a4x, a4y) = accel(p4x, p4y, v4x, v4y, thrust, steering)
+
+        p5x = (px + dt * a51 * vx + dt * a52 * v2x + dt * a53 * v3x
+                + dt * a54 * v4x)
+        p5y = (py + dt * a51 * vy + dt * a52 * v2y + dt * a53 * v3y
+                + dt * a54 * v4y)
+        v5x = (vx + dt * a51 * a1x + dt * a52 * a2x + dt * a53 * a3x
+                + dt * a54 * a4x)
+        v5y = (vy + dt * a51 * a1y + dt * a52 * a2y + dt * a53 * a3y
+                + dt * a54 * a4y)
+        (a5x, a5y) = accel(p5x, p5y, v5x, v5y, thrust, steering)
+
+        p6x = (px + dt * a61 * vx + dt * a62 * v2x + dt * a63 * v3x
+                + dt * a64 * v4x + dt * a65 * v5x)
+        p6y = (py + dt * a61 * vy + dt * a62 * v2y + dt * a63 * v3y
+                + dt * a64 * v4y + dt * a65 * v5y)
+        v6x = (vx + dt * a61 * a1x + dt * a62 * a2x + dt * a63 * a3x
+                + dt * a64 * a4x + dt * a65 * a5x)
+        v6y = (vy + dt * a61 * a1y + dt * a62 * a2y + dt * a63 * a3y
+                + dt * a64 * a4y + dt * a65 * a5y)
+        (a6x, a6y) = accel(p6x, p6y, v6x, v6y, thrust, steering)
+
+        # The last stage is evaluated at the fifth-order solution: its
+        # weights are _dpB.
+        p7x = (px + dt * a71 * vx + dt * a73 * v3x + dt * a74 * v4x
+                + dt * a75 * v5x + dt * a76 * v6x)
+        p7y = (py + dt * a71 * vy + dt * a73 * v3y + dt * a74 * v4y
+                + dt * a75 * v5y + dt * a76 * v6y)
+        v7x = (vx + dt * a71 * a1x + dt * a73 * a3x + dt * a74 * a4x
+                + dt * a75 * a5x + dt * a76 * a6x)
+        v7y = (vy + dt * a71 * a1y + dt * a73 * a3y + dt * a74 * a4y
+                + dt * a75 * a5y + dt * a76 * a6y)
+        (a7x, a7y) = accel(p7x, p7y, v7x, v7y, thrust, steering)
+
+        pNextX = px + dt * (a71 * vx + a73 * v3x + a74 * v4x + a75 * v5x
+                + a76 * v6x)
+        pNextY = py + dt * (a71 * vy + a73 * v3y + a74 * v4y + a75 * v5y
+                + a76 * v6y)
+        vNextX = vx + dt * (a71 * a1x + a73 * a3x + a74 * a4x + a75 * a5x
+                + a76 * a6x)
+        vNextY = vy + dt * (a71 * a1y + a73 * a3y + a74 * a4y + a75 * a5y
+                + a76 * a6y)
+        pErrX = e1 * vx + e3 * v3x + e4 * v4x + e5 * v5x + e6 * v6x + e7 * v7x
+        pErrY = e1 * vy + e3 * v3y + e4 * v4y + e5 * v5y + e6 * v6y + e7 * v7y
+        vErrX = e1 * a1x + e3 * a3x + e4 * a4x + e5 * a5x + e6 * a6x + e7 * a7x
+        vErrY = e1 * a1y + e3 * a3y + e4 * a4y + e5 * a5y + e6 * a6y + e7 * a7y
+        pError = dt * sqrt(pErrX ** 2 + pErrY ** 2)
+        vError = dt * sqrt(vErrX ** 2 + vErrY ** 2)
+        return (pNextX, pNextY, vNextX, vNextY, max(pError, vError))
+
+
+# One sample along the climb slope.  The climb slope keeps its samples in
+# columns (see climbSlope.columns); this is a copy of one of them, for
+# printing.
+class ClimbPoint(object):
+    def __init__(self, alt, v, thrust, t, dV, dragLoss, thrustLimited):
+        self.altitude = alt
+        self.velocity = v
+        self.thrust   = thrust
+        self.time     = t
+        self.deltaV   = dV
+        self.dragLoss = dragLoss
+        self.thrustLimited = thrustLimited
+
+    def __str__(self):
+        theta = math.atan2(self.velocity[1], self.velocity[0])
+        return (
+            "%g s: %gm altitude, %g m/s at pitch %g; %gm/s deltaV, %g drag, thrust %g m/s^2%s"
+            % (self.time, self.altitude,
+                L2(self.velocity), math.degrees(theta),
+                self.deltaV,
+                self.dragLoss,
+                self.thrust,
+                "" if not self.thrustLimited else
+                        (" needs %smore thrust" % (
+                            "" if self.thrustLimited is True else
+                                ("%g m/s^2" % self.thrustLimited)))
+            ))
+
+
+# Below this many lookups at once, altitudesAtDeltaV bisects the columns
+# one lookup at a time: setting up numpy costs more than it saves.
+_minLookups = 32
+
 class climbSlope(object):
     def __init__(self,
         planet,
@@ -69,7 +406,9 @@ class climbSlope(object):
         dragCoefficient = None,
         specificImpulse = None,
         shipThrust = None,
-        endAngleDeg = 0):
+        endAngleDeg = 0,
+        tolerance = None,
+        maxTime = 1000):
         """
         Compute a climb slope for exiting the atmosphere and achieving orbit.
 
@@ -99,8 +438,18 @@ class climbSlope(object):
         Specify the timestep to change the accuracy; by default we
         use a timestep of 1s.  It is a fixed timestep.  Smaller timesteps
         improve simulation accuracy (until we start to build up numerical error),
-        but take longer.  This uses Euler integration because I'm too lazy
-        to code up Runge-Kutta.
+        but take longer.  This uses RK4 integration.
+
+        Alternatively, specify a tolerance (in m/s) to adapt the step as we
+        go, with Dormand-Prince integration: each step may err by about the
+        tolerance in velocity, position (in m), and deltaV.  Steps get long
+        in vacuum and short where the thrust changes fast, such as at max-Q.
+        The timestep is then the first step; steps range from 1/1000 to 30
+        times that.  A tolerance of 0.01 is more accurate than a fixed 0.1s
+        step, in a small fraction of the steps.
+
+        We give up with a BadFlightPlanException if we haven't reached the
+        orbit after maxTime seconds.
         """
         # The math:
         # At each timestep, we compute:
@@ -118,31 +467,6 @@ class climbSlope(object):
         # - deltaV goes up by the thrust applied
         # - time goes up by the timestep
         # - drag loss goes up
-        class ClimbPoint(object):
-            def __init__(self, alt, v, thrust, t, dV, dragLoss, thrustLimited):
-                self.altitude = alt
-                self.velocity = v
-                self.thrust   = thrust
-                self.time     = t
-                self.deltaV   = dV
-                self.dragLoss = dragLoss
-                self.thrustLimited = thrustLimited
-
-            def __str__(self):
-                theta = math.atan2(self.velocity[1], self.velocity[0])
-                return (
-                    "%g s: %gm altitude, %g m/s at pitch %g; %gm/s deltaV, %g drag, thrust %g m/s^2%s"
-                    % (self.time, self.altitude,
-                        L2(self.velocity), math.degrees(theta),
-                        self.deltaV,
-                        self.dragLoss,
-                        self.thrust,
-                        "" if not self.thrustLimited else
-                                (" needs %smore thrust" % (
-                                    "" if self.thrustLimited is True else
-                                        ("%g m/s^2" % self.thrustLimited)))
-                    ))
-
         self.planet = planet
         self.launchInclination = launchInclination # used to estimate circularization
 
@@ -192,7 +516,12 @@ class climbSlope(object):
         # Numerical integration time: every timestep until we reach apoapsis,
         # decide how much to burn and update our position.
         targetApoapsis = orbitAltitude + planet.radius
-        climbSlope = []             # ClimbPoint list
+        # One column per field of a ClimbPoint.  The thrust limit is 0 if
+        # the thrust wasn't limited, the missing thrust if we calculate it,
+        # and 1 otherwise.
+        columns = dict((name, array('d')) for name in self.columns)
+        (altitudes, vxs, vys, thrusts, times, deltaVs, dragLossColumn,
+                thrustLimits) = (columns[name] for name in self.columns)
         loss_steering = 0
         loss_drag     = 0
         loss_gravity  = 0
@@ -201,67 +530,80 @@ class climbSlope(object):
         # the desired apoapsis.
         thrust_apo = None
 
-        while h < targetApoapsis and t < 1000:
-            if h < planet.radius:
-                # We crashed!  Bring more thrust next time.
-                raise BadFlightPlanException
-
-            alt = h - planet.radius
-
-            # get:
-            # the angle of our position relative to coordinate horizontal
-            # the angle of velocity relative to coordinate horizontal
-            # the angle of velocity relative to surface horizontal
-            (psi, theta, thetaSurf) = angles(p, v)
-
+        # The step we're taking.  It only varies if we have a tolerance.
+        dt = timestep
+        minStep = timestep / 1000
+        maxStep = timestep * 30
+        lastThrust = None
+        # How far past the target altitude the last step may land; we aim
+        # the apoapsis that far past the target too, so the climb crosses
+        # it rather than creeping up on it.
+        if tolerance is not None:
+            overshoot = tolerance * v_orbit / planet.gravity(orbitAltitude)
+            aimApoapsis = targetApoapsis + overshoot
+
+        def steering(alt):
             # phiSurf is the angle of thrust relative to the surface.
             # Straight up before the gravity turn, straight sideways after,
             # and interpolate linearly during the turn.
             if alt <= gravityTurnStart:
-                phiSurf = 0
+                return 0
             elif alt >= gravityTurnEnd:
-                phiSurf = - (math.pi / 2)
+                return - (math.pi / 2)
             else:
                 # What fraction of the turn have we done?
                 ratio = (alt - gravityTurnStart) / (gravityTurnEnd - gravityTurnStart)
                 ratio **= gravityTurnCurve
                 # The more we did, the closer we want to be to pi/2 from
                 # the straight-up orientation.
-                phiSurf = - (ratio * (math.pi / 2 - endAngleRad))
+                return - (ratio * (math.pi / 2 - endAngleRad))
+
+        # The state is in scalars from here on, and the physics of the step
+        # is in the kernel, to keep the loop from allocating.
+        kernel = climbKernel(planet, dragCoefficient)
+        (px, py) = p
+        (vx, vy) = v
+        radius = planet.radius
+        mu = planet.mu
+        halfPi = math.pi / 2
+        atan2 = math.atan2
+
+        while h < targetApoapsis and t < maxTime:
+            if h < radius:
+                # We crashed!  Bring more thrust next time.
+                raise BadFlightPlanException
+
+            alt = h - radius
+
+            # get (as in angles):
+            # the angle of our position relative to coordinate horizontal
+            # the angle of velocity relative to coordinate horizontal
+            # the angle of velocity relative to surface horizontal
+            psi = atan2(py, px)
+            if vx * vx + vy * vy == 0:
+                theta = psi
+            else:
+                theta = atan2(vy, vx)
+            thetaSurf = theta + halfPi - psi
+
+            phiSurf = steering(alt)
             # phi is the angle of thrust in the original coordinate frame.
             phi = phiSurf + psi
+            cosPhi = cos(phi)
+            sinPhi = sin(phi)
+            cosTheta = cos(theta)
+            sinTheta = sin(theta)
+            cosPsi = cos(psi)
+            sinPsi = sin(psi)
 
             # Compute the gravity and drag.
-            a_grav = planet.gravity(alt)
-            a_drag = planet.drag(alt, L2(v), dragCoefficient)
-
-            # Terminal velocity for our altitude:
-            #print ("drag %g m/s^2, grav %g m/s^2, term %g m/s" % (a_drag, a_grav, v_term))
+            a_grav = kernel.gravity(alt)
+            a_drag = kernel.drag(alt, sqrt(vx ** 2 + vy ** 2))
 
             # Compute the velocity after the given amount of thrust.
             # First, compute the loss on both axes.
-            loss = (
-                - (a_drag * cos(theta) + a_grav * cos(psi)),
-                - (a_drag * sin(theta) + a_grav * sin(psi))
-            )
-            v_nothrust = [ v[i] + loss[i] * timestep for i in range(2) ]
-
-            def total_accel(pos, vel, thr):
-                altitude = L2(pos) - planet.radius
-                ag = planet.gravity(altitude)
-                ad = planet.drag(altitude, L2(vel), dragCoefficient)
-                return (
-                    thr * cos(phi) - (ad * cos(theta) + ag * cos(psi)),
-                    thr * sin(phi) - (ad * sin(theta) + ag * sin(psi))
-                )
-
-            def thrustResult2(thrust, tx, ty):
-                return (v_nothrust[0] + thrust * tx, v_nothrust[1] + thrust * ty)
-
-            def thrustResult(thrust):
-                tx = cos(phi) * timestep
-                ty = sin(phi) * timestep
-                return thrustResult2(thrust, tx, ty)
+            v_nothrust_x = vx - (a_drag * cosTheta + a_grav * cosPsi) * dt
+            v_nothrust_y = vy - (a_drag * sinTheta + a_grav * sinPsi) * dt
 
             # Compute the acceleration that gets us to terminal velocity in the
             # direction of thrust.
@@ -282,88 +624,31 @@ class climbSlope(object):
             #       dt^2 alpha^2 + 2 dt (v_no^T X) alpha + (v_no^T X)^2 - v_term^2 = 0
             # Makes a quadratic equation.
             #
-            # Return the bigger solution, or zero if both solutions are negative.
-            def findTerminalThrust():
+            # Take the bigger solution.
+            if alt >= TOA:
                 # above the top of the atmosphere, there is no limit!
-                if alt >= TOA: return 1e30
-                v_term = planet.terminalVelocity(alt, dragCoefficient)
-                a = timestep * timestep
-                v_noTX = v_nothrust[0] * cos(phi) + v_nothrust[1] * sin(phi)
-                b = 2 * timestep * v_noTX
-                c = v_noTX - v_term * v_term
-                soln = physics.quadratic(a,b,c)
-                return max(soln)
-
-            # Binary search the thrust to achieve the apoapsis.
-            # I'm sure this could be worked out analytically.
-            # Use the terminal velocity thrust to reduce our search space.
-            def findApoapsisThrust(thrust_term, guess = None):
-
-                # The most we could want to speed up is enough to immediately
-                # get our momentum to match what it will when we have a
-                # circular orbit:
-                # Generally,
-                #       P = r.v
-                # now: r.v = (|v| cos theta, |v| sin theta) . p
-                #       |v| = P/p.(cos theta, sin theta)
-                # with P unknown.
-                # at the circular orbit we are targetting, P = apoapsis * v_orbit.
-                # So the most speed we want now is:
-                #   |v| = v_orbit * targetApoapsis / (p[0] cos theta + p[1] sin theta)
-                # And we want to reach that speed in one timestep.
-                # This is an upper bound: if we thrust that much now, we'll
-                # send our apoapsis much higher than the target, since we're
-                # generally not currently at the present apoapsis.
-                v_targetMax = (v_orbit * targetApoapsis /
-                               (p[0]*cos(thetaSurf) + p[1]*sin(thetaSurf)))
-                thrust_targetMax = (v_targetMax - L2(v_nothrust)) / timestep
-
-                tx = cos(phi) * timestep
-                ty = sin(phi) * timestep
-
-                theta = math.atan2(p[1], p[0])
-
-                thrust_lo = 0
-                thrust_hi = min(thrust_targetMax, thrust_term)
-                # while we are off by more than 1mm/s, binary search
-                # we waste a bit of time searching for really big solutions.
-                while thrust_hi - thrust_lo > 1e-3:
-                    if guess and guess < thrust_hi:
-                        thrust = guess
-                        guess = None
-                    else:
-                        thrust = (thrust_hi + thrust_lo) / 2
-                    v_next = thrustResult2(thrust, tx, ty)
-                    (apoapsis, _) = planet.determineOrbit3(h, theta, v_next)
-
-                    # if apoapsis is too high, or negative (i.e. hyperbolic), reduce thrust
-                    if apoapsis > targetApoapsis or apoapsis < 0:
-                        thrust_hi = thrust
-                    else:
-                        thrust_lo = thrust
-                return thrust_lo # or hi, it's only 1mm/s difference
-
-            def getAcceleration(dv, alt):
-                acc = acceleration
-                if variable_accel:
-                    # dv = isp * g0 * ln(m0/m1)
-                    # m0 / m1 = math.exp(dv / (isp * g0))
-                    # 1 + dm / m0 = math.exp(dv / (isp * g0))
-                    # dm = m0 * (math.exp(dv / (isp * g0)) - 1)
-                    # m = m0 - dm
-                    # m = m0 * (1 - (math.exp(dv / (isp * g0)) - 1))
-                    # m = m0 * (2 - math.exp(dv / (isp * g0)))
-                    # m0 = shipThrust / acceleration
-                    # m = (2 - math.exp(dv / (isp * g0))) * shipThrust / acceleration
-                    # acc = shipThrust / m
-                    # acc = acceleration / (2 - math.exp(dv / (isp * g0)))
-                    acc /= (2 - math.exp(dv / (specificImpulse * 9.81)))
-                return acc
-
-            a_thrust = getAcceleration(dV, alt)
-
-            thrust_term = findTerminalThrust()
-            guess = thrust_apo
+                thrust_term = 1e30
+            else:
+                v_term = kernel.terminalVelocity(alt)
+                v_noTX = v_nothrust_x * cosPhi + v_nothrust_y * sinPhi
+                thrust_term = max(physics.quadratic(dt * dt, 2 * dt * v_noTX,
+                        v_noTX - v_term * v_term))
+
+            a_thrust = acceleration
+            if variable_accel:
+                # dv = isp * g0 * ln(m0/m1)
+                # m0 / m1 = math.exp(dv / (isp * g0))
+                # 1 + dm / m0 = math.exp(dv / (isp * g0))
+                # dm = m0 * (math.exp(dv / (isp * g0)) - 1)
+                # m = m0 - dm
+                # m = m0 * (1 - (math.exp(dv / (isp * g0)) - 1))
+                # m = m0 * (2 - math.exp(dv / (isp * g0)))
+                # m0 = shipThrust / acceleration
+                # m = (2 - math.exp(dv / (isp * g0))) * shipThrust / acceleration
+                # acc = shipThrust / m
+                # acc = acceleration / (2 - math.exp(dv / (isp * g0)))
+                a_thrust /= (2 - math.exp(dV / (specificImpulse * 9.81)))
+
             thrust_limit = thrust_term
             if not calculateExtraThrust:
                 # It's nice to know if thrust_apo exceeds possible thrust
@@ -372,7 +657,55 @@ class climbSlope(object):
                 # a_thrust. This will still tell us if we need more thrust, it
                 # just won't tell us how much extra thrust we need.
                 thrust_limit = min(thrust_term, a_thrust + 1)
-            thrust_apo = findApoapsisThrust(thrust_limit, guess)
+
+            # Find the thrust to achieve the apoapsis: in closed form (see
+            # apoapsisThrust) if we can, by binary search if not.
+            # Use the terminal velocity thrust to reduce our search space.
+            #
+            # The most we could want to speed up is enough to immediately
+            # get our momentum to match what it will when we have a
+            # circular orbit:
+            # Generally,
+            #       P = r.v
+            # now: r.v = (|v| cos theta, |v| sin theta) . p
+            #       |v| = P/p.(cos theta, sin theta)
+            # with P unknown.
+            # at the circular orbit we are targetting, P = apoapsis * v_orbit.
+            # So the most speed we want now is:
+            #   |v| = v_orbit * targetApoapsis / (p[0] cos theta + p[1] sin theta)
+            # And we want to reach that speed in one timestep.
+            # This is an upper bound: if we thrust that much now, we'll
+            # send our apoapsis much higher than the target, since we're
+            # generally not currently at the present apoapsis.
+            v_targetMax = (v_orbit * targetApoapsis /
+                           (px*cos(thetaSurf) + py*sin(thetaSurf)))
+            thrust_targetMax = (v_targetMax
+                    - sqrt(v_nothrust_x ** 2 + v_nothrust_y ** 2)) / dt
+
+            tx = cosPhi * dt
+            ty = sinPhi * dt
+
+            thrust_hi = min(thrust_targetMax, thrust_limit)
+
+            guess = thrust_apo
+            thrust_apo = None
+            if tolerance is not None:
+                # Plan the burn from where we are: the impulse that puts
+                # the apoapsis on target, spread over the step.  Unlike
+                # the prediction below, it doesn't depend on the step.
+                impulse = apoapsisThrust(px, py, vx, vy, cosPhi, sinPhi,
+                        mu, aimApoapsis)
+                if impulse is not None:
+                    thrust_apo = max(0, min(impulse / dt, thrust_hi))
+            elif exactApoapsisThrust:
+                thrust = apoapsisThrust(px, py, v_nothrust_x, v_nothrust_y,
+                        tx, ty, mu, targetApoapsis)
+                if thrust is not None:
+                    thrust_apo = max(0, min(thrust, thrust_hi))
+            if thrust_apo is None:
+                thrust_apo = searchApoapsisThrust(planet, targetApoapsis, h,
+                        psi, v_nothrust_x, v_nothrust_y, tx, ty, thrust_hi,
+                        guess)
 
             thrust = min(thrust_term, thrust_apo)
 
@@ -385,114 +718,153 @@ class climbSlope(object):
                 thrustLimit = (thrust - a_thrust) if calculateExtraThrust else True
                 thrust = a_thrust
 
-            vmag = math.sqrt(v[0] ** 2 + v[1] ** 2)
-            vdot = 0 if not vmag else (v[0] * cos(phi) + v[1] * sin(phi)) / vmag
-            loss_steering += timestep * thrust * (1 - vdot)
-            loss_drag     += timestep * a_drag
-            loss_gravity  += timestep * math.fabs(sin(thetaSurf)) * planet.gravity(alt)
-
-            def vmult(val, vector):
-                return [val * x for x in vector]
-
-            def vadd(v1, v2):
-                return [v1[i] + v2[i] for i in range(len(v1))]
-
-            def update_rk4(p, v):
-                dv1 = vmult(timestep, total_accel(p, v, thrust))
-                dx1 = vmult(timestep, v)
-
-                dv2 = vmult(timestep, total_accel(vadd(p, vmult(0.5, dx1)), vadd(v, vmult(0.5, dv1)), thrust))
-                dx2 = vmult(timestep, vadd(v, vmult(0.5, dv1)))
-
-                dv3 = vmult(timestep, total_accel(vadd(p, vmult(0.5, dx2)), vadd(v, vmult(0.5, dv2)), thrust))
-                dx3 = vmult(timestep, vadd(v, vmult(0.5, dv2)))
-
-                dv4 = vmult(timestep, total_accel(vadd(p, dx3), vadd(v, dv3), thrust))
-                dx4 = vmult(timestep, vadd(v, dv3))
-
-                dx = vmult(1.0 / 6.0, vadd(vadd(vadd(dx1, vmult(2, dx2)), vmult(2, dx3)), dx4))
-                dv = vmult(1.0 / 6.0, vadd(vadd(vadd(dv1, vmult(2, dv2)), vmult(2, dv3)), dv4))
-
-                p = vadd(p, dx)
-                v = vadd(v, dv)
-                return (p, v)
-
-            def update_euler(p, v):
-                for i in (0,1): p[i] += v[i] * timestep
-                v = thrustResult(thrust)
-                return (p, v)
+            vmag = math.sqrt(vx ** 2 + vy ** 2)
+            vdot = 0 if not vmag else (vx * cosPhi + vy * sinPhi) / vmag
 
             # Update everything!
-            (p, v) = update_rk4(p, v)
-            h = L2(p)
-
-            dV += thrust * timestep
-            dragLoss += a_drag * timestep
-            t += timestep
-            climbSlope.append(ClimbPoint(alt, v, thrust, t, dV, dragLoss, thrustLimit))
-
-        if t == 1000:
+            if tolerance is None:
+                (px, py, vx, vy) = kernel.rk4(px, py, vx, vy, dt,
+                        thrust * cosPhi, thrust * sinPhi,
+                        cosTheta, sinTheta, cosPsi, sinPsi)
+            else:
+                (pxNext, pyNext, vxNext, vyNext, error) = kernel.dormandPrince(
+                        px, py, vx, vy, dt, thrust, steering)
+                # Holding the thrust steady over the step is good to first
+                # order: we miss about half the change in thrust over the
+                # step, which we estimate from the last step.
+                if lastThrust is None:
+                    controlError = 0
+                else:
+                    controlError = (0.5 * abs(thrust - lastThrust) / lastDt
+                            * dt * dt)
+                error /= tolerance
+                controlError /= tolerance
+                # Scale the step to bring the worse of the two errors
+                # (fifth and second order in dt) to 90% of the tolerance.
+                scale = min(0.9 * error ** -0.2 if error else 5,
+                            0.9 * controlError ** -0.5 if controlError else 5)
+                scale = max(0.2, min(5, scale))
+                if (error > 1 or controlError > 1) and dt > minStep:
+                    dt = max(minStep, dt * scale)
+                    continue
+                (px, py, vx, vy) = (pxNext, pyNext, vxNext, vyNext)
+                (lastThrust, lastDt) = (thrust, dt)
+                # The thrust is set one step at a time, from where we are at
+                # the start of the step; a long step at full thrust would
+                # carry on burning after the apoapsis reached the target.
+                # Plan the next step to end about when the burn should.
+                burnLeft = maxStep
+                if thrustLimit:
+                    heading = (steering(sqrt(px ** 2 + py ** 2) - radius)
+                            + atan2(py, px))
+                    need = apoapsisThrust(px, py, vx, vy, cos(heading),
+                            sin(heading), mu, aimApoapsis)
+                    if need is not None:
+                        burnLeft = need / thrust
+            h = sqrt(px ** 2 + py ** 2)
+            if tolerance is not None:
+                # Tally the drag from both ends of the long steps.
+                a_drag = (a_drag + kernel.drag(h - radius,
+                        sqrt(vx ** 2 + vy ** 2))) / 2
+
+            loss_steering += dt * thrust * (1 - vdot)
+            loss_drag     += dt * a_drag
+            loss_gravity  += dt * math.fabs(sin(thetaSurf)) * a_grav
+
+            dV += thrust * dt
+            dragLoss += a_drag * dt
+            t += dt
+            if tolerance is not None:
+                # The steps are too long to tag the end of the step with
+                # the altitude at its start.
+                alt = h - radius
+            altitudes.append(alt)
+            vxs.append(vx)
+            vys.append(vy)
+            thrusts.append(thrust)
+            times.append(t)
+            deltaVs.append(dV)
+            dragLossColumn.append(dragLoss)
+            thrustLimits.append(thrustLimit)
+            if tolerance is not None:
+                # Land the last step just past the target altitude: the
+                # speed we end with sets the circularization burn.
+                climbLeft = maxStep
+                vr = (px * vx + py * vy) / h
+                if vr > 0:
+                    climbLeft = (targetApoapsis - h + overshoot) / vr
+                dt = max(minStep, min(maxStep, dt * scale, burnLeft, climbLeft))
+
+        if h < targetApoapsis:
             # Timed out...
             raise BadFlightPlanException
 
         self.loss_steering = loss_steering
         self.loss_drag     = loss_drag
         self.loss_gravity  = loss_gravity
-        self._climbSlope = climbSlope
+        self.calculateExtraThrust = calculateExtraThrust
+        for name in self.columns:
+            setattr(self, name, columns[name])
         self.planet = planet
         self.orbit = orbitAltitude
 
-    def _bsearch(self, attrname, query):
+    # The climb slope, one array of doubles per field, in the order of
+    # ClimbPoint's arguments; the velocity is split into its x and y
+    # components.  The names mustn't hide a method, as dragLosses would.
+    columns = ('altitudes', 'vxs', 'vys', 'thrusts', 'times', 'deltaVs',
+            'dragLossColumn', 'thrustLimits')
+
+    def __len__(self):
+        return len(self.times)
+
+    def __getitem__(self, i):
+        """
+        Return the i'th sample along the climb slope, as a ClimbPoint.
+        """
+        thrustLimited = self.thrustLimits[i]
+        if not self.calculateExtraThrust:
+            thrustLimited = bool(thrustLimited)
+        return ClimbPoint(self.altitudes[i], [self.vxs[i], self.vys[i]],
+            self.thrusts[i], self.times[i], self.deltaVs[i],
+            self.dragLossColumn[i], thrustLimited)
+
+    def _bsearch(self, keys, query):
         """
-        Return the index that has the biggest key that is no bigger
-        than the query key.  Must be something that grows monotonically
-        (deltaV, altitude, losses, or time).
+        Return the index of the first key equal to the query, or failing
+        that of the biggest key smaller than the query.  The keys are a
+        column that grows monotonically (deltaVs, altitudes, or times); it
+        can stall, as deltaV does while we coast.
         Raises a KeyError if the query is outside the range we simulated.
         """
-        lo = 0
-        data = self._climbSlope
-        hi = len(data)
-        while lo < hi - 1:
-            mid = (lo + hi) // 2
-            val = getattr(data[mid], attrname)
-            if val == query:
-                return mid
-            elif val < query:
-                lo = mid
-            else:
-                hi = mid
-        if lo == len(data) - 1:
+        index = bisect_left(keys, query)
+        if index < len(keys) and keys[index] == query:
+            return index
+        if index == 0 or index == len(keys):
             # Not found.
             raise KeyError
-        else:
-            return lo
+        return index - 1
 
-    def _interpolate(self, keyname, query, valuename):
+    def _interpolate(self, keys, query, values):
         """
         Search the climb slope for the query, which will generally lie
         between two data points, and linearly interpolate between them.
-        The key must be sorted (this means deltaV, altitude, losses, or
-        time).
+        The keys must be sorted (this means deltaVs, altitudes, or times).
         Raises a KeyError if the query is outside the range we simulated.
         """
-        index = self._bsearch(keyname, query)
-        before = self._climbSlope[index]
-        beforekey = getattr(before, keyname)
+        index = self._bsearch(keys, query)
+        beforekey = keys[index]
         if beforekey == query:
-            return getattr(before, valuename)
-        if query < beforekey:
-            raise KeyError
-
-        after  = self._climbSlope[index + 1]
-        afterkey = getattr(after, keyname)
-        assert afterkey > query
-        assert afterkey > beforekey
-
-        beforevalue = getattr(before, valuename)
-        aftervalue = getattr(after, valuename)
+            return values[index]
 
+        afterkey = keys[index + 1]
         ratio = (query - beforekey) / (afterkey - beforekey)
-        return ratio * aftervalue + (1-ratio) * beforevalue
+        return ratio * values[index + 1] + (1-ratio) * values[index]
+
+    def maxThrust(self):
+        """
+        The most thrust (in m/s^2) we use along the climb.
+        """
+        return max(self.thrusts)
 
 
     def deltaVToAltitude(self, altitude):
@@ -502,7 +874,7 @@ class climbSlope(object):
 
         Raises a KeyError if the query is outside the range we simulated.
         """
-        return self._interpolate("altitude", altitude, "deltaV")
+        return self._interpolate(self.altitudes, altitude, self.deltaVs)
 
     def deltaV(self):
         """
@@ -512,10 +884,10 @@ class climbSlope(object):
         - take account of sidereal rotation depending on the launch angle
         """
         v_orbit = self.planet.orbitalVelocity(self.orbitAltitude)
-        v_last = L2(self._climbSlope[-1].velocity)
+        v_last = L2([self.vxs[-1], self.vys[-1]])
         v_last += cos(self.launchInclination) * self.planet.siderealRotationSpeed
         dV_circ = v_orbit - v_last
-        return self._climbSlope[-1].deltaV + dV_circ
+        return self.deltaVs[-1] + dV_circ
 
     def deltaVBetween(self, altitude0, altitude1):
         """
@@ -529,7 +901,7 @@ class climbSlope(object):
         Tally up how much we lost fighting aerodynamic drag to get up to
         apoapsis.
         """
-        return self._climbSlope[-1].dragLoss
+        return self.dragLossColumn[-1]
 
     def altitudeAtDeltaV(self, deltaV, default = KeyError):
         """
@@ -539,16 +911,357 @@ class climbSlope(object):
         (i.e. it corresponds to deltaV that exceeds what we spent to get to
         apoapsis).
         """
-        if deltaV <= self._climbSlope[0].deltaV:
-            return self._climbSlope[0].altitude
+        if deltaV <= self.deltaVs[0]:
+            return self.altitudes[0]
         try:
-            return self._interpolate("deltaV", deltaV, "altitude")
+            return self._interpolate(self.deltaVs, deltaV, self.altitudes)
         except KeyError:
             if default == KeyError:
                 raise
             else:
                 return default
 
+    def altitudesAtDeltaV(self, deltaVs, default = KeyError):
+        """
+        As altitudeAtDeltaV, for each of a sequence of deltaVs; returns a
+        list of the altitudes.
+        """
+        if numpy is None or len(deltaVs) < _minLookups or len(self) < 2:
+            return [ self.altitudeAtDeltaV(dV, default) for dV in deltaVs ]
+
+        keys = numpy.frombuffer(self.deltaVs)
+        values = numpy.frombuffer(self.altitudes)
+        queries = numpy.asarray(deltaVs, dtype = float)
+        last = len(keys) - 1
+        after = numpy.searchsorted(keys, queries)
+        beyond = after > last
+        if beyond.any() and default == KeyError:
+            raise KeyError
+        after = numpy.clip(after, 1, last)
+        exact = keys[after] == queries
+
+        # The same interpolation as _interpolate, lane by lane.
+        (beforekey, afterkey) = (keys[after - 1], keys[after])
+        with numpy.errstate(divide = 'ignore', invalid = 'ignore'):
+            ratio = (queries - beforekey) / (afterkey - beforekey)
+            altitudes = ratio * values[after] + (1-ratio) * values[after - 1]
+        altitudes[exact] = values[after][exact]
+        altitudes[queries <= keys[0]] = values[0]
+        altitudes = altitudes.tolist()
+        for i in numpy.flatnonzero(beyond):
+            altitudes[i] = default
+        return altitudes
+
     def __str__(self):
-        return "\n".join( (str(p) for p in self._climbSlope) )
+        return "\n".join( (str(self[i]) for i in range(len(self))) )
+
 
+
+##############################
+# Many climbs at once.
+
+class climbSummary(object):
+    """
+    The outcome of a climb simulated by climbSlopes: what a climbSlope says
+    of its deltaV and losses, without the climb itself.
+    """
+    def __init__(self, planet, orbitAltitude, launchInclination, velocity,
+            deltaV, dragLoss, loss_gravity, loss_drag, loss_steering):
+        self.planet = planet
+        self.orbitAltitude = orbitAltitude
+        self.launchInclination = launchInclination
+        self.velocity = velocity    # at the top of the climb
+        self.climbDeltaV = deltaV   # spent on the climb
+        self.dragLoss = dragLoss
+        self.loss_gravity  = loss_gravity
+        self.loss_drag     = loss_drag
+        self.loss_steering = loss_steering
+
+    def deltaV(self):
+        """
+        As climbSlope.deltaV: what we spent to climb, and to circularize.
+        """
+        v_orbit = self.planet.orbitalVelocity(self.orbitAltitude)
+        v_last = L2(self.velocity)
+        v_last += cos(self.launchInclination) * self.planet.siderealRotationSpeed
+        dV_circ = v_orbit - v_last
+        return self.climbDeltaV + dV_circ
+
+    def dragLosses(self):
+        return self.dragLoss
+
+def climbSlopes(planet, climbs, **options):
+    """
+    Simulate many climbs on the planet.  Each of the climbs is a dict of
+    climbSlope's keyword arguments, on top of the options they all share.
+    Returns, for each climb, something with the deltaV(), dragLosses() and
+    loss tallies of its climbSlope, or None if it was a bad flight plan.
+
+    With numpy, the climbs advance in lock-step as arrays, dropping out as
+    they reach their apoapsis.  A step costs much the same however many
+    lanes are left, and the batch steps until its slowest climb is done (a
+    climb that never gets there runs to its maxTime), so two hundred climbs
+    cost about as much as fifty on their own.  They agree with climbSlope
+    to within rounding, and raise the same ValueError if the thrust to
+    terminal velocity has no solution.  Without numpy, or with a tolerance
+    (the steps would differ from one climb to the next), we run a
+    climbSlope for each.
+    """
+    climbs = [ dict(options, **climb) for climb in climbs ]
+    if numpy is None or any(c.get('tolerance') is not None for c in climbs):
+        results = []
+        for climb in climbs:
+            try:
+                results.append(climbSlope(planet, **climb))
+            except BadFlightPlanException:
+                results.append(None)
+        return results
+    return _climbBatch(planet, climbs)
+
+def _climbBatch(planet, climbs):
+    """
+    climbSlopes, with numpy.  The loop is climbSlope's fixed-step loop, on
+    arrays with a lane per climb.
+    """
+    n = len(climbs)
+    results = [ None ] * n
+    if not n:
+        return results
+
+    def option(name, default = None):
+        return [ climb.get(name, default) for climb in climbs ]
+
+    # Fill in the defaults, as climbSlope does.
+    TOA = planet.topOfAtmosphere()
+    radius = planet.radius
+    mu = planet.mu
+    orbitAltitude = [ TOA + 1000 if a is None else a
+                      for a in option('orbitAltitude') ]
+    initialAltitude = option('initialAltitude', 0)
+    launchInclination = option('launchInclination', 0)
+    gravityTurnStart = [ planet.altitude(planet.datumPressure / 8)
+                         if a is None else a
+                         for a in option('gravityTurnStart') ]
+    gravityTurnEnd = [ min(TOA + 1000, orbit) if a is None else a
+                       for (a, orbit) in zip(option('gravityTurnEnd'),
+                                             orbitAltitude) ]
+    acceleration = [ 2.2 * planet.gravity(alt0) if a is None else a
+                     for (a, alt0) in zip(option('acceleration'),
+                                          initialAltitude) ]
+    dragCoefficient = [ planet.defaultDragCoefficient if d is None else d
+                        for d in option('dragCoefficient') ]
+    initialVelocity = [ (0, 0) if v is None else v
+                        for v in option('initialVelocity') ]
+    specificImpulse = option('specificImpulse')
+
+    def lanes(values):
+        return numpy.array(values, dtype = float)
+
+    # Everything we track, a lane per climb that's still going.  We drop
+    # the lanes of the climbs that are done.
+    L = {
+        'id':               numpy.arange(n),
+        'px':               numpy.zeros(n),
+        'py':               lanes(initialAltitude) + radius,
+        'vx':               lanes([ v[0] for v in initialVelocity ]),
+        'vy':               lanes([ v[1] for v in initialVelocity ]),
+        't':                numpy.zeros(n),
+        'dV':               numpy.zeros(n),
+        'dragLoss':         numpy.zeros(n),
+        'loss_steering':    numpy.zeros(n),
+        'loss_drag':        numpy.zeros(n),
+        'loss_gravity':     numpy.zeros(n),
+        'guess':            numpy.zeros(n),
+        'targetApoapsis':   lanes(orbitAltitude) + radius,
+        'v_orbit':          lanes([ planet.orbitalVelocity(a)
+                                    for a in orbitAltitude ]),
+        'gravityTurnStart': lanes(gravityTurnStart),
+        'gravityTurnEnd':   lanes(gravityTurnEnd),
+        'gravityTurnCurve': lanes(option('gravityTurnCurve', 1)),
+        'endAngleRad':      lanes(option('endAngleDeg', 0)) * math.pi / 180,
+        'dt':               lanes(option('timestep', 1)),
+        'maxTime':          lanes(option('maxTime', 1000)),
+        'acceleration':     lanes(acceleration),
+        'variable_accel':   numpy.array([ not (isp is None and thrust is None)
+                                          for (isp, thrust) in
+                                          zip(specificImpulse,
+                                              option('shipThrust')) ]),
+        'specificImpulse':  lanes([ float("nan") if isp is None else isp
+                                    for isp in specificImpulse ]),
+        'calculateExtraThrust':
+                            numpy.array(option('calculateExtraThrust', False),
+                                        dtype = bool),
+        'dragFactor':       gamma * lanes(dragCoefficient),
+        'terminalFactor':   gamma * lanes(dragCoefficient) * planet.datumPressure,
+    }
+    L['h'] = numpy.sqrt(L['px'] ** 2 + L['py'] ** 2)
+
+    datumPressure = planet.datumPressure
+    scale = planet.scale
+    halfPi = math.pi / 2
+    where = numpy.where
+    nsqrt = numpy.sqrt
+    nexp = numpy.exp
+    ncos = numpy.cos
+    nsin = numpy.sin
+
+    with numpy.errstate(divide = 'ignore', invalid = 'ignore', over = 'ignore'):
+        while True:
+            # Retire the climbs that reached their apoapsis, crashed, or timed
+            # out.
+            done = L['h'] >= L['targetApoapsis']
+            failed = ~done & ((L['t'] >= L['maxTime']) | (L['h'] < radius))
+            finished = done | failed
+            if finished.any():
+                for j in numpy.flatnonzero(done):
+                    i = L['id'][j]
+                    results[i] = climbSummary(planet, orbitAltitude[i],
+                            launchInclination[i],
+                            (float(L['vx'][j]), float(L['vy'][j])),
+                            float(L['dV'][j]), float(L['dragLoss'][j]),
+                            float(L['loss_gravity'][j]),
+                            float(L['loss_drag'][j]),
+                            float(L['loss_steering'][j]))
+                going = ~finished
+                if not going.any():
+                    break
+                for key in L:
+                    L[key] = L[key][going]
+
+            (px, py, vx, vy, h, dt) = (L['px'], L['py'], L['vx'], L['vy'],
+                                       L['h'], L['dt'])
+            targetApoapsis = L['targetApoapsis']
+            gravityTurnStart = L['gravityTurnStart']
+            gravityTurnEnd = L['gravityTurnEnd']
+            dragFactor = L['dragFactor']
+
+            alt = h - radius
+
+            psi = numpy.arctan2(py, px)
+            theta = where(vx * vx + vy * vy == 0, psi, numpy.arctan2(vy, vx))
+            thetaSurf = theta + halfPi - psi
+
+            ratio = ((alt - gravityTurnStart)
+                     / (gravityTurnEnd - gravityTurnStart))
+            ratio **= L['gravityTurnCurve']
+            phiSurf = where(alt <= gravityTurnStart, 0,
+                      where(alt >= gravityTurnEnd, - halfPi,
+                            - (ratio * (halfPi - L['endAngleRad']))))
+            phi = phiSurf + psi
+            cosPhi = ncos(phi)
+            sinPhi = nsin(phi)
+            cosTheta = ncos(theta)
+            sinTheta = nsin(theta)
+            cosPsi = ncos(psi)
+            sinPsi = nsin(psi)
+
+            r = radius + alt
+            a_grav = mu / (r*r)
+            speed = nsqrt(vx ** 2 + vy ** 2)
+            a_drag = where(alt >= TOA, 0, dragFactor
+                    * (datumPressure * nexp(-alt / scale)) * (speed ** 2))
+
+            v_nothrust_x = vx - (a_drag * cosTheta + a_grav * cosPsi) * dt
+            v_nothrust_y = vy - (a_drag * sinTheta + a_grav * sinPsi) * dt
+
+            # The thrust that gets us to terminal velocity.
+            v_term = nexp(0.5 * alt / scale) * nsqrt(a_grav / L['terminalFactor'])
+            v_noTX = v_nothrust_x * cosPhi + v_nothrust_y * sinPhi
+            a = dt * dt
+            b = 2 * dt * v_noTX
+            c = v_noTX - v_term * v_term
+            discriminant = b * b - 4 * a * c
+            if (discriminant[alt < TOA] < 0).any():
+                # physics.quadratic raises on these in climbSlope.
+                raise ValueError("math domain error")
+            thrust_term = where(alt >= TOA, 1e30,
+                    (-b + nsqrt(discriminant)) / (2 * a))
+
+            a_thrust = L['acceleration'] / where(L['variable_accel'],
+                    2 - nexp(L['dV'] / (L['specificImpulse'] * 9.81)), 1)
+            thrust_limit = where(L['calculateExtraThrust'], thrust_term,
+                    numpy.minimum(thrust_term, a_thrust + 1))
+
+            # The thrust that gets us to the apoapsis: apoapsisThrust, on
+            # arrays, and searchApoapsisThrust for the lanes it can't settle.
+            v_targetMax = (L['v_orbit'] * targetApoapsis /
+                           (px * ncos(thetaSurf) + py * nsin(thetaSurf)))
+            thrust_targetMax = (v_targetMax
+                    - nsqrt(v_nothrust_x ** 2 + v_nothrust_y ** 2)) / dt
+            tx = cosPhi * dt
+            ty = sinPhi * dt
+            thrust_hi = numpy.minimum(thrust_targetMax, thrust_limit)
+
+            R = targetApoapsis
+            c0 = px * v_nothrust_y - py * v_nothrust_x
+            c1 = px * ty - py * tx
+            R2 = R * R
+            a = c1 * c1 - R2 * (tx * tx + ty * ty)
+            b = 2 * (c0 * c1 - R2 * (v_nothrust_x * tx + v_nothrust_y * ty))
+            c = (c0 * c0 - R2 * (v_nothrust_x ** 2 + v_nothrust_y ** 2)
+                 + 2 * mu * R * (R / nsqrt(px * px + py * py) - 1))
+            discriminant = b * b - 4 * a * c
+            thrust_apo = where(c < 0, 0,
+                    (-b - nsqrt(discriminant)) / (2 * a))
+            thrust_apo = numpy.maximum(0, numpy.minimum(thrust_apo, thrust_hi))
+            if exactApoapsisThrust:
+                unsettled = (a >= 0) | ((c < 0) & (b > 0) & (discriminant >= 0))
+            else:
+                unsettled = numpy.ones(len(px), dtype = bool)
+            for j in numpy.flatnonzero(unsettled):
+                guess = L['guess'][j]
+                thrust_apo[j] = searchApoapsisThrust(planet,
+                        targetApoapsis[j], h[j], psi[j], v_nothrust_x[j],
+                        v_nothrust_y[j], tx[j], ty[j], thrust_hi[j],
+                        guess if guess else None)
+            L['guess'] = thrust_apo
+
+            thrust = numpy.minimum(thrust_term, thrust_apo)
+            thrust = where(thrust < a_thrust, numpy.maximum(thrust, 0),
+                           a_thrust)
+
+            vdot = where(speed == 0, 0, (vx * cosPhi + vy * sinPhi) / speed)
+
+            # Update everything, by RK4 as climbKernel.rk4 does.
+            thrustX = thrust * cosPhi
+            thrustY = thrust * sinPhi
+            def accel(sx, sy, svx, svy):
+                altitude = nsqrt(sx ** 2 + sy ** 2) - radius
+                r = radius + altitude
+                ag = mu / (r*r)
+                ad = where(altitude >= TOA, 0, dragFactor
+                        * (datumPressure * nexp(-altitude / scale))
+                        * (nsqrt(svx ** 2 + svy ** 2) ** 2))
+                return (thrustX - (ad * cosTheta + ag * cosPsi),
+                        thrustY - (ad * sinTheta + ag * sinPsi))
+            (ax, ay) = accel(px, py, vx, vy)
+            (dv1x, dv1y) = (dt * ax, dt * ay)
+            (dx1x, dx1y) = (dt * vx, dt * vy)
+            (svx, svy) = (vx + 0.5 * dv1x, vy + 0.5 * dv1y)
+            (ax, ay) = accel(px + 0.5 * dx1x, py + 0.5 * dx1y, svx, svy)
+            (dv2x, dv2y) = (dt * ax, dt * ay)
+            (dx2x, dx2y) = (dt * svx, dt * svy)
+            (svx, svy) = (vx + 0.5 * dv2x, vy + 0.5 * dv2y)
+            (ax, ay) = accel(px + 0.5 * dx2x, py + 0.5 * dx2y, svx, svy)
+            (dv3x, dv3y) = (dt * ax, dt * ay)
+            (dx3x, dx3y) = (dt * svx, dt * svy)
+            (svx, svy) = (vx + dv3x, vy + dv3y)
+            (ax, ay) = accel(px + dx3x, py + dx3y, svx, svy)
+            (dv4x, dv4y) = (dt * ax, dt * ay)
+            (dx4x, dx4y) = (dt * svx, dt * svy)
+
+            sixth = 1.0 / 6.0
+            L['px'] = px + sixth * (dx1x + 2 * dx2x + 2 * dx3x + dx4x)
+            L['py'] = py + sixth * (dx1y + 2 * dx2y + 2 * dx3y + dx4y)
+            L['vx'] = vx + sixth * (dv1x + 2 * dv2x + 2 * dv3x + dv4x)
+            L['vy'] = vy + sixth * (dv1y + 2 * dv2y + 2 * dv3y + dv4y)
+            L['h'] = nsqrt(L['px'] ** 2 + L['py'] ** 2)
+
+            L['loss_steering'] += dt * thrust * (1 - vdot)
+            L['loss_drag']     += dt * a_drag
+            L['loss_gravity']  += dt * numpy.fabs(nsin(thetaSurf)) * a_grav
+            L['dV'] += thrust * dt
+            L['dragLoss'] += a_drag * dt
+            L['t'] += dt
+
+    return results
@@ -0,0 +1,109 @@
+import argparse
+import json
+import os
+import sys
+import time
+
+import ascent
+import planet
+
+# Benchmark ascent.climbSlope: time a few ascents with the apoapsis thrust
+# found by binary search and in closed form (see ascent.apoapsisThrust), and
+# report how much the deltaV of the climb moves, and the steps per second
+# of the closed form against a stored baseline.  Before timing, check that
+# every public method of a climb slope answers, and that they agree with
+# each other.
+#
+# The baseline in bench-ascent.json was measured with the climbSlope loop as
+# it was before climbKernel.  Save a new one with --save, say when moving to
+# a different machine.
+
+ASCENTS = (
+    ("Kerbin to 80 km",   planet.kerbin, dict(orbitAltitude =  80000)),
+    ("Kerbin to 100 km",  planet.kerbin, dict(orbitAltitude = 100000)),
+    ("Eve to 100 km",     planet.eve,    dict(orbitAltitude = 100000)),
+    ("Duna to 60 km",     planet.duna,   dict(orbitAltitude =  60000)),
+    ("Kerbin, full thrust", planet.kerbin, dict(orbitAltitude = 100000,
+                                                calculateExtraThrust = True)),
+)
+HERE = os.path.dirname(os.path.abspath(__file__))
+BASELINE = os.path.join(HERE, 'bench-ascent.json')
+
+def timeAscent(body, options, exact, minTime = 1):
+    """
+    Return the seconds per climbSlope, and the last climb slope.
+    """
+    ascent.exactApoapsisThrust = exact
+    n = 0
+    start = time.time()
+    while n < 3 or time.time() - start < minTime:
+        slope = ascent.climbSlope(body, **options)
+        n += 1
+    return ((time.time() - start) / n, slope)
+
+def checkSlope(slope):
+    """
+    Call every public method of the climb slope, and check the answers
+    are consistent.
+    """
+    n = len(slope)
+    assert n > 1
+    (first, last) = (slope[0], slope[n - 1])
+    assert str(slope).count("\n") == n - 1
+    assert slope.deltaV() > last.deltaV
+    assert slope.dragLosses() == last.dragLoss
+    assert slope.maxThrust() == max(slope[i].thrust for i in range(n))
+
+    middle = slope[n // 2]
+    assert slope.deltaVToAltitude(middle.altitude) == middle.deltaV
+    assert slope.altitudeAtDeltaV(first.deltaV) == first.altitude
+    assert slope.altitudeAtDeltaV(last.deltaV + 1, None) is None
+    assert slope.deltaVBetween(first.altitude, first.altitude) == 0
+
+    deltaVs = [ last.deltaV * i / 100 for i in range(101) ] + [ last.deltaV + 1 ]
+    one = [ slope.altitudeAtDeltaV(dV, None) for dV in deltaVs ]
+    assert slope.altitudesAtDeltaV(deltaVs, None) == one
+    assert slope.altitudesAtDeltaV(deltaVs[:3], None) == one[:3]
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description = "Benchmark the ascent simulation.")
+    parser.add_argument('--baseline', default = BASELINE,
+            help = 'baseline file (default: %(default)s)')
+    parser.add_argument('--save', action = 'store_true',
+            help = 'save the steps per second as the new baseline')
+    args = parser.parse_args(sys.argv[1:])
+
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baselines = json.load(f)
+    else:
+        baselines = {}
+
+    for (name, body, options) in ASCENTS:
+        checkSlope(ascent.climbSlope(body, **options))
+        checkSlope(ascent.climbSlope(body, tolerance = 0.01, **options))
+
+    print ("%-20s %12s %12s %8s %14s %10s %10s %8s" % ("ascent",
+            "search (ms)", "exact (ms)", "speedup", "deltaV change",
+            "steps/s", "baseline", "vs. base"))
+    results = {}
+    for (name, body, options) in ASCENTS:
+        (searched, searchedSlope) = timeAscent(body, options, False)
+        (exact, exactSlope) = timeAscent(body, options, True)
+        stepsPerSecond = len(exactSlope) / exact
+        results[name] = stepsPerSecond
+        baseline = baselines.get(name)
+        print ("%-20s %12.2f %12.2f %7.2fx %10.5f m/s %10.0f %10s %8s"
+                % (name, searched * 1e3, exact * 1e3, searched / exact,
+                   exactSlope.deltaV() - searchedSlope.deltaV(),
+                   stepsPerSecond,
+                   "-" if baseline is None else "%.0f" % baseline,
+                   "-" if baseline is None
+                       else "%.2fx" % (stepsPerSecond / baseline)))
+
+    if args.save:
+        baselines.update(results)
+        with open(args.baseline, "w") as f:
+            json.dump(baselines, f, indent = 2, sort_keys = True)
+            f.write("\n")
+        print ("Saved the baseline to %s" % args.baseline)
@@ -0,0 +1,30 @@
+import timeit
+
+from LinkedList import LinkedList, cons, nil
+
+# Micro-benchmark for LinkedList at the stage depths the searches reach:
+# lko-mission.py runs to about 20 stages, eve-mission.py to about 50.  The
+# search conses one stage at a time onto shared tails, asks for len() of
+# every partial solution, and iterates over stacks to collect engines.
+
+DEPTHS = (5, 20, 50)
+
+def build(depth):
+    stages = nil
+    for i in xrange(depth):
+        stages = cons(i, stages)
+    return stages
+
+def bench(label, stmt, setup, number):
+    t = min(timeit.repeat(stmt, setup, repeat = 3, number = number))
+    print ("%-28s %8.2f us" % (label, t / number * 1e6))
+
+if __name__ == "__main__":
+    for depth in DEPTHS:
+        setup = ("from __main__ import build, cons, LinkedList; "
+                 "stages = build(%d); items = range(%d)" % (depth, depth))
+        print ("depth %d:" % depth)
+        bench("  cons onto the stack", "cons(0, stages)", setup, 100000)
+        bench("  len", "len(stages)", setup, 100000)
+        bench("  iterate", "for s in stages: pass", setup, 20000)
+        bench("  build from a list", "LinkedList(items)", setup, 20000)
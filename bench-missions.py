@@ -0,0 +1,195 @@
+from __future__ import division
+
+import argparse
+import imp
+import json
+import os
+import resource
+import subprocess
+import sys
+import time
+
+# Benchmark the rocket design search on the mission scripts.  Each mission
+# runs in its own process, searching quietly with a fixed budget of
+# expansions; the search is deterministic, so runs are comparable.  We
+# record the rate of expansions, the time to the first solution and to the
+# best mass the baseline found, and the peak memory use, and compare them
+# against a stored baseline to flag regressions.
+#
+# Save a new baseline with --save after a change that's meant to move the
+# numbers, or when moving to a different machine.
+
+MISSIONS = ( 'lko-mission.py', 'lko-100.py', 'eve-mission.py' )
+HERE = os.path.dirname(os.path.abspath(__file__))
+BASELINE = os.path.join(HERE, 'bench-missions.json')
+
+def runMission(script, budget):
+    """
+    Run the mission with the given budget of expansions, in this process.
+    Returns a dict of the measurements.
+    """
+    import rockets
+
+    name = os.path.splitext(os.path.basename(script))[0].replace('-', '_')
+    mission = imp.load_source(name, script)
+
+    improvements = []
+    start = time.time()
+    def onImprove(stages):
+        improvements.append( (time.time() - start, stages.head.fullMass) )
+    result = rockets.designWithin(mission.burns, maxExpansions = budget,
+            onImprove = onImprove, **mission.options)
+
+    # ru_maxrss is in kB on Linux, bytes on OS X.
+    peakRSS = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == 'darwin': peakRSS /= 1024
+    return {
+        'expansions':           result.nexpansions,
+        'elapsed':              result.elapsed,
+        'expansionsPerSecond':  result.nexpansions / result.elapsed,
+        'mass':                 result.mass,
+        'lowerBound':           result.lowerBound,
+        'improvements':         improvements,
+        'peakRSS':              peakRSS / 1024, # MB
+    }
+
+def measure(script, budget):
+    """
+    Run the mission in a fresh process, so the caches start out cold and
+    we can measure its peak memory use.
+    """
+    env = dict(os.environ)
+    env['PYTHONHASHSEED'] = '0'
+    child = subprocess.Popen(
+            [ sys.executable, os.path.abspath(__file__), '--child', script,
+              '--budget', str(budget) ],
+            cwd = HERE, env = env, stdout = subprocess.PIPE)
+    (out, _) = child.communicate()
+    if child.returncode != 0:
+        raise RuntimeError("%s failed with status %d" % (script, child.returncode))
+    return json.loads(out.strip().splitlines()[-1])
+
+def timeToMass(improvements, mass):
+    """
+    How long it took to get down to the given mass, or None if we never did.
+    """
+    if mass is None: return None
+    for (t, m) in improvements:
+        if m <= mass + 1e-9:
+            return t
+    return None
+
+def summarize(run, bestMass):
+    return {
+        'expansions':           run['expansions'],
+        'expansionsPerSecond':  run['expansionsPerSecond'],
+        'mass':                 run['mass'],
+        'timeToFirst':          run['improvements'][0][0] if run['improvements'] else None,
+        'timeToBest':           timeToMass(run['improvements'], bestMass),
+        'peakRSS':              run['peakRSS'],
+    }
+
+def compare(name, current, baseline, tolerance):
+    """
+    Return a list of complaints about how the current run compares to the
+    baseline.
+    """
+    complaints = []
+    def worse(key, higherIsBetter):
+        (cur, base) = (current[key], baseline[key])
+        if base is None: return
+        if cur is None:
+            complaints.append("%s: no %s (baseline %g)" % (name, key, base))
+            return
+        if higherIsBetter:
+            bad = cur < base * (1 - tolerance)
+        else:
+            # A little absolute slack, for the times that are near zero.
+            bad = cur > base * (1 + tolerance) + 0.05
+        if bad:
+            complaints.append("%s: %s %g vs. baseline %g" % (name, key, cur, base))
+
+    worse('expansionsPerSecond', True)
+    worse('timeToFirst', False)
+    worse('timeToBest', False)
+    worse('peakRSS', False)
+    if baseline['mass'] is not None and (current['mass'] is None or
+            current['mass'] > baseline['mass'] + 1e-6):
+        complaints.append("%s: best mass %s vs. baseline %g"
+                % (name, current['mass'], baseline['mass']))
+    return complaints
+
+def fmt(x, spec):
+    return "-" if x is None else spec % x
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description = "Benchmark the rocket design search.")
+    parser.add_argument('missions', nargs = '*', default = MISSIONS,
+            help = 'mission scripts (default: %s)' % ' '.join(MISSIONS))
+    parser.add_argument('--budget', type = int, default = 2000,
+            help = 'expansions per mission (default: %(default)s)')
+    parser.add_argument('--baseline', default = BASELINE,
+            help = 'baseline file (default: %(default)s)')
+    parser.add_argument('--tolerance', type = float, default = 0.2,
+            help = 'relative slack before flagging a regression (default: %(default)s)')
+    parser.add_argument('--save', action = 'store_true',
+            help = 'save the results as the new baseline')
+    parser.add_argument('--child', help = argparse.SUPPRESS)
+    args = parser.parse_args(sys.argv[1:])
+
+    if args.child:
+        # Keep the mission's output away from our result.
+        realStdout = sys.stdout
+        sys.stdout = sys.stderr
+        result = runMission(args.child, args.budget)
+        realStdout.write(json.dumps(result) + "\n")
+        sys.exit(0)
+
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baselines = json.load(f)
+    else:
+        baselines = {}
+
+    results = {}
+    complaints = []
+    print ("%-16s %10s %10s %10s %10s %10s %8s"
+            % ("mission", "expansions", "exp/s", "mass (T)", "first (s)",
+               "best (s)", "RSS (MB)"))
+    for script in args.missions:
+        name = os.path.basename(script)
+        baseline = baselines.get(name)
+        if baseline is not None and baseline['budget'] != args.budget:
+            print ("%s: baseline has a budget of %d; not comparing"
+                    % (name, baseline['budget']))
+            baseline = None
+
+        run = measure(script, args.budget)
+        bestMass = baseline['mass'] if baseline else run['mass']
+        current = summarize(run, bestMass)
+        current['budget'] = args.budget
+        results[name] = current
+        print ("%-16s %10d %10.0f %10s %10s %10s %8.1f"
+                % (name, current['expansions'], current['expansionsPerSecond'],
+                   fmt(current['mass'], "%.3f"),
+                   fmt(current['timeToFirst'], "%.3f"),
+                   fmt(current['timeToBest'], "%.3f"),
+                   current['peakRSS']))
+        if baseline:
+            if current['expansions'] != baseline['expansions']:
+                print ("%s: %d expansions vs. baseline %d; the search order changed"
+                        % (name, current['expansions'], baseline['expansions']))
+            complaints.extend(compare(name, current, baseline, args.tolerance))
+
+    if args.save:
+        baselines.update(results)
+        with open(args.baseline, "w") as f:
+            json.dump(baselines, f, indent = 2, sort_keys = True)
+            f.write("\n")
+        print ("Saved the baseline to %s" % args.baseline)
+    elif complaints:
+        print ("")
+        print ("Regressions:")
+        for c in complaints:
+            print ("  %s" % c)
+        sys.exit(1)
@@ -0,0 +1,63 @@
+import sys
+import time
+
+import rockets
+import planet
+from LRUCache import LRUCache
+
+# Micro-benchmark for stage evaluation: time partialSolution.extend with the
+# plain Python stage search and with the numpy-vectorized one, and check
+# that they suggest the same stages.
+
+def collectPartials(burns, minStageDeltaV, maxPartials):
+    """
+    Walk the search trees of the mission breadth-first to collect a sample of
+    partial solutions to extend.
+    """
+    search = rockets.designSearch((2,), (1,), verbose = False)
+    partials = []
+    queue = search.makeCandidates(rockets.splitBurns(burns, minStageDeltaV))
+    while queue and len(partials) < maxPartials:
+        p = queue.pop(0)
+        if p.complete: continue
+        partials.append(p)
+        queue.extend(p.extend())
+    return partials
+
+def describe(stages):
+    return sorted((s.engineType.name, s.numEngines, s.numTowers, s.asparagus,
+                   s.propellantMass, s.fullMass) for s in stages)
+
+def timeExtend(partials, vectorize, repeat):
+    rockets.vectorizeStages = vectorize
+    results = []
+    start = time.time()
+    for _ in xrange(repeat):
+        # Don't let the memo hide the work.
+        rockets.stageMemo = LRUCache(0)
+        results = [ p.extend() for p in partials ]
+    elapsed = time.time() - start
+    return (elapsed / (repeat * len(partials)), results)
+
+if __name__ == "__main__":
+    if rockets.numpy is None:
+        sys.exit("numpy is not installed; nothing to compare.")
+
+    kerbinorbit = 100000
+    burns = (
+        rockets.liftoffBurn("Depart Kerbin", planet.kerbin, orbit = kerbinorbit,
+                payload = 2),
+        rockets.deepSpaceBurn("De-orbit", 500, payload = 5),
+    )
+    partials = collectPartials(burns, 500, 300)
+
+    repeat = 5
+    (scalar, scalarResults) = timeExtend(partials, False, repeat)
+    (vector, vectorResults) = timeExtend(partials, True, repeat)
+
+    mismatches = sum(1 for (a, b) in zip(scalarResults, vectorResults)
+            if describe(c.stages.head for c in a) != describe(c.stages.head for c in b))
+    print ("%d partial solutions, %d mismatched" % (len(partials), mismatches))
+    print ("python: %8.1f us per extend()" % (scalar * 1e6))
+    print ("numpy:  %8.1f us per extend()" % (vector * 1e6))
+    print ("speedup: %.2fx" % (scalar / vector))
@@ -48,10 +48,20 @@ class engine(object):
         self.vectoring = vectoring  # true or false
         self.radial = radial        # true of false
         self.large = large          # true: 2m, false: 1m (can use bi/tricoupler)
+        self.index = None           # position in types, if it's there
 
     def __str__(self): return self.name
 
+    # Engines are compared by identity, so pickle them by name.
+    def __reduce__(self):
+        return (getEngine, (self.name,))
+
     def Isp(self, planet, altitude):
+        if self.index is None:
+            return self.computeIsp(planet, altitude)
+        return ispTable(planet, altitude)[self.index]
+
+    def computeIsp(self, planet, altitude):
         # Assumption: Isp is in a linear correspondence with pressure,
         # clipped to 1 Atm (as determined by experiments on Kerbin and Eve).
         #
@@ -102,15 +112,39 @@ types = (
     # engine("RT-10",     240,    0.5,     250, solid=433),
     # engine("BACC",      250,    1.75,    300, solid=850),
 )
+for (i, e) in enumerate(types): e.index = i
 _engineDict = dict((e.name.lower(), e) for e in types)
 def getEngine(name):
     return _engineDict[name.lower()]
 
 
+# Computing an Isp takes the pressure, an exp() call; but a search only ever
+# asks about the few altitudes its burns start at.  Remember the Isp of
+# every engine in types at each (planet, altitude), in the order of types.
+_ispTables = {}
+_MAX_ISP_TABLES = 10000
+
+def ispTable(planet, altitude):
+    """
+    Return the Isp of each engine in types at the given altitude on the given
+    planet (None for vacuum), as a tuple indexed by engine.index.
+    """
+    if planet is None or altitude is None:
+        key = None
+    else:
+        key = (planet, altitude)
+    table = _ispTables.get(key)
+    if table is None:
+        if len(_ispTables) >= _MAX_ISP_TABLES:
+            _ispTables.clear()
+        table = tuple(e.computeIsp(planet, altitude) for e in types)
+        _ispTables[key] = table
+    return table
+
+
 # To help the heuristics, choose the best possible Isp at a given altitude.
 def maxIsp(planet, altitude):
-    ispMaxEngine = max(types, key = lambda x: x.Isp(planet, altitude))
-    return ispMaxEngine.Isp(planet, altitude)
+    return max(ispTable(planet, altitude))
 
 
 # To help the heuristics, choose the best possible mass to achieve a given
@@ -211,23 +245,36 @@ def combineIsp(engines, planet, altitude):
     requires re-deriving the ideal rocket equation, but with two engines,
     and generalizing in the obvious way.
     """
-    def alpha(e, c):
-        # no thrust => no contribution (even if Isp is zero)
-        if c == 0 or e.thrust == 0: return 0
-        else: return e.thrust * c / e.Isp(planet, altitude)
+    return combineEngines(engines, planet, altitude)[2]
 
+def combineEngines(engines, planet, altitude):
+    """
+    Like combineIsp, but return the triple (thrust, vectoring thrust, Isp) of
+    the engines, all computed in one pass with the cached Isps.
+    """
     try:
-        totalthrust  = sum(e.thrust * c for (e,c) in engines.iteritems())
-        totalweights = sum(alpha(e,c)   for (e,c) in engines.iteritems())
+        engines = engines.iteritems()
     except AttributeError:
-        totalthrust  = sum(e.thrust * c for (e,c) in engines)
-        totalweights = sum(alpha(e,c)   for (e,c) in engines)
+        pass
+    isps = ispTable(planet, altitude)
+    totalthrust = 0
+    vectoringthrust = 0
+    totalweights = 0
+    for (e, c) in engines:
+        thrust = e.thrust * c
+        totalthrust += thrust
+        if e.vectoring:
+            vectoringthrust += thrust
+        # no thrust => no contribution (even if Isp is zero)
+        if c != 0 and e.thrust != 0:
+            Isp = isps[e.index] if e.index is not None else e.Isp(planet, altitude)
+            totalweights += thrust / Isp
 
     # no thrust at all => Isp may as well be zero
     if totalthrust == 0:
-        return 0
+        return (totalthrust, vectoringthrust, 0)
     else:
-        return totalthrust / totalweights
+        return (totalthrust, vectoringthrust, totalthrust / totalweights)
 
 
 # combine 2x nuke and 1x sail
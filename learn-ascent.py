@@ -1,4 +1,5 @@
 import argparse
+import collections
 import math
 import os
 import random
@@ -36,15 +37,14 @@ class Profile:
 
         self.ascent     = None
 
-        self.score = self.cache.get((self.gt0, self.gt1, self.curve, self.endAngle), None)
-        if self.score is None:
-            if len(self.cache) == self.MAX_CACHE_SIZE:
-                del self.cache[random.choice(self.cache.keys())]
-            self._calc_score()
-            self.cache[(self.gt0, self.gt1, self.curve, self.endAngle)] = self.score
+        # Scored later, along with the rest of the pool; see evaluate.
+        self.score = self.cache.get(self.key(), None)
 
         self.generation = 1
 
+    def key(self):
+        return (self.gt0, self.gt1, self.curve, self.endAngle)
+
     @classmethod
     def init(cls, planet, alt0, alt1, accel, drag):
         cls.planet = planet
@@ -88,22 +88,43 @@ class Profile:
 
         return value + (random.random() - 0.5) * (math.sqrt(math.fabs(value)) if value else 1) * amount
 
-    def _calc_score(self):
-        try:
-            self.ascent = ascent.climbSlope(self.planet,
-                    orbitAltitude       = self.alt1 * 1000,
-                    gravityTurnStart    = self.gt0 * 1000,
-                    gravityTurnEnd      = self.gt1 * 1000,
-                    gravityTurnCurve    = self.curve,
-                    acceleration        = self.planet.gravity() * self.accel,
-                    initialAltitude     = self.alt0 * 1000,
-                    dragCoefficient     = self.drag,
-                    endAngleDeg         = self.endAngle
-                    )
-            self.score = self.ascent.deltaV()
-        except ascent.BadFlightPlanException as bfpe:
-            self.score = -1
-            self.ascent = None
+    @classmethod
+    def evaluate(cls, profiles):
+        """
+        Score the profiles that haven't been, simulating all their ascents
+        at once.
+        """
+        pending = collections.OrderedDict()
+        for profile in profiles:
+            if profile.score is not None:
+                continue
+            score = cls.cache.get(profile.key(), None)
+            if score is not None:
+                profile.score = score
+            else:
+                pending.setdefault(profile.key(), []).append(profile)
+        if not pending:
+            return
+
+        ascents = ascent.climbSlopes(cls.planet,
+                [ dict( gravityTurnStart    = gt0 * 1000,
+                        gravityTurnEnd      = gt1 * 1000,
+                        gravityTurnCurve    = curve,
+                        endAngleDeg         = endAngle)
+                  for (gt0, gt1, curve, endAngle) in pending ],
+                orbitAltitude       = cls.alt1 * 1000,
+                acceleration        = cls.planet.gravity() * cls.accel,
+                initialAltitude     = cls.alt0 * 1000,
+                dragCoefficient     = cls.drag)
+        for (key, climb) in zip(pending, ascents):
+            # None if it was a bad flight plan.
+            score = climb.deltaV() if climb else -1
+            if len(cls.cache) == cls.MAX_CACHE_SIZE:
+                del cls.cache[random.choice(cls.cache.keys())]
+            cls.cache[key] = score
+            for profile in pending[key]:
+                profile.score = score
+                profile.ascent = climb
 
     def _combine(self, a, b):
         average = (a ** 2 + b ** 2) ** 0.5
@@ -206,6 +227,7 @@ def learnAscent(planetName, startAlt = 0, endAlt = None, accel = 2, drag = 0.2,
         print("%6s %s" % ("iter", Profile.desc_header()))
     try:
         while True:
+            Profile.evaluate(pool)
             best = None
             worst = None
             total = 0
@@ -263,6 +285,7 @@ def learnAscent(planetName, startAlt = 0, endAlt = None, accel = 2, drag = 0.2,
 
     except KeyboardInterrupt:
         print("")
+        Profile.evaluate(pool)
         pool.append(bestEver)
         pool.sort()
         with open(fileOut, "w") as f:
@@ -8,4 +8,8 @@ KerbinLiftoff = rockets.liftoffBurn("Depart Kerbin", planet.kerbin, orbit = kerb
                     payload = 115)
 KerbinArrival = rockets.deepSpaceBurn("De-orbit", 500, payload = 0.08)
 
-rockets.design( ( KerbinLiftoff, KerbinArrival ), minStageDeltaV = 250 , symmetry = 4)
+burns = ( KerbinLiftoff, KerbinArrival )
+options = dict(minStageDeltaV = 250, symmetry = 4)
+
+if __name__ == "__main__":
+    rockets.design(burns, **options)
@@ -6,4 +6,8 @@ kerbinorbit = 100000
 KerbinLiftoff = rockets.liftoffBurn("Depart Kerbin", planet.kerbin, orbit = kerbinorbit, payload = 2)
 KerbinArrival = rockets.deepSpaceBurn("De-orbit", 500, payload = 5)
 
-rockets.design( ( KerbinLiftoff, KerbinArrival ), minStageDeltaV = 250 )
+burns = ( KerbinLiftoff, KerbinArrival )
+options = dict(minStageDeltaV = 250)
+
+if __name__ == "__main__":
+    rockets.design(burns, **options)
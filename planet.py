@@ -53,6 +53,10 @@ class planet(object):
 
     def __str__(self): return self.name
 
+    # Planets are compared by identity, so pickle them by name.
+    def __reduce__(self):
+        return (getPlanet, (self.name,))
+
     def gravity(self, altitude = 0):
         """
         Return the gravitational acceleration at a given altitude above the
@@ -15,14 +15,29 @@
 
 from __future__ import division # / means float div always
 
+import collections
+import hashlib
+import json
 import math
+import multiprocessing
 from numbers import Number
 import heapq
+import os
+import pickle
+import signal
+import time
 from LinkedList import LinkedList, cons, nil
+from LRUCache import LRUCache
 
 import ascent
 import engine
 import physics
+import planet
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
 
 """
 This module is a work in progress aimed at automatically designing low-mass
@@ -40,7 +55,16 @@ produce decent rockets.
 
 class stage(object):
     """
+    One stage of a rocket.  Searches hold a great many of these, and share
+    them between partial solutions, so they're slotted and must not be
+    modified once built.
     """
+    __slots__ = ('targetDeltaV', 'payload', 'engineType', 'numEngines',
+            'numTowers', 'asparagus', 'engineMass', 'decouplerMass',
+            'propellantMass', 'tankMass', 'dryMass', 'fullMass', 'Isp',
+            'thrust', 'vectoringThrust', 'altitude', 'planet',
+            '_achievedDeltaV')
+
     def __init__(self, deltaV, payload, engineType, nEngines, laterEngines,
                 numTowers, planet, altitude, propMassOverride = None):
 
@@ -50,10 +74,8 @@ class stage(object):
             allEngines[engineType] += nEngines
         else:
             allEngines[engineType] = nEngines
-        thrust = sum(e.thrust * count for (e, count) in allEngines.iteritems())
-        vectoringThrust = sum(e.thrust * count for (e, count) in
-            allEngines.iteritems() if e.vectoring)
-        Isp = engine.combineIsp(allEngines, planet, altitude)
+        (thrust, vectoringThrust, Isp) = engine.combineEngines(allEngines,
+                planet, altitude)
 
         # Calculate masses.
         # Engine mass is specified already.  We only count the engines
@@ -103,9 +125,13 @@ class stage(object):
         self.vectoringThrust = vectoringThrust
         self.altitude = altitude
         self.planet = planet
+        self._achievedDeltaV = None
 
     def achievedDeltaV(self):
-        return self.Isp * physics.g0 * math.log(self.fullMass / self.dryMass)
+        if self._achievedDeltaV is None:
+            self._achievedDeltaV = (self.Isp * physics.g0
+                    * math.log(self.fullMass / self.dryMass))
+        return self._achievedDeltaV
 
     def acceleration(self):
         return self.thrust / self.fullMass
@@ -163,6 +189,70 @@ class stage(object):
                  self.Isp)
         )
 
+def _towerChoices(symmetry, numBaseTowers, engineType, laterEngines):
+    """
+    Return the number of towers the stage is built on, and the list of tower
+    counts to try fitting engines onto.
+    """
+    # How many towers do we have?
+    # If we only have no engines, or only radial engines above, we can fit
+    # on the base number of towers.  Otherwise we have a number of towers
+    # according to symmetry, attached to the side of the previous stage.  Then,
+    # further we can add any number of towers to this stage, according to
+    # symmetry.  I'm allowing up to 2 more steps.
+    for e in laterEngines:
+        if not e.radial:
+            numBaseTowers = symmetry
+            break
+    if engineType == engine.noEngine:
+        # don't try adding more of these to get more thrust!
+        numTowerChoices = [ numBaseTowers ]
+    else:
+        numTowerChoices = [ numBaseTowers + symmetry * i for i in range(3) ]
+    return (numBaseTowers, numTowerChoices)
+
+def _engineCounts(symmetry, numTowers, engineType):
+    """
+    Return the numbers of engines we might fit on the given number of
+    towers, fewest first, and the extra mass (couplers) each number needs.
+    """
+    # Count up how many engines we might be able to use.
+    # TODO: I'm not allowing mixing engine types.  In particular, you could
+    # have a stage with both standard and radial engines; or if you have
+    # more than one tower, you could use a bicoupler or tricoupler with 2
+    # types of engines.
+    if engineType == engine.noEngine:
+        # The "none" engine is just an asparagus fuel stage.
+        numEngines = [ 1 ]
+        extraMass = [ 0 ]
+    elif engineType.large:
+        # We can only fit one engine on each tower.
+        numEngines = [ numTowers ]
+        extraMass = [ 0 ]
+    elif engineType.radial:
+        # We can fit up to 8 Mark-55s, or 16 24-77s.
+        # But the part count gets ridiculous fast, so keep it much lower.
+        maxRadials = 4
+
+        if numTowers == 1:
+            # If we have one tower, we need to maintain symmetry.
+            maxEngines = int(math.ceil(maxRadials/symmetry))
+            numEngines = [ x * symmetry for x in range(1, maxEngines + 1) ]
+        else:
+            # Otherwise we can use any number, even a prime number.
+            numEngines = [ x * numTowers for x in range(1,maxRadials + 1) ]
+        extraMass = [ 0 for _ in range(len(numEngines)) ]
+    else:
+        # We can use 1, 2 (on a bicoupler), 3 (on a tricoupler), or 4 (on
+        # chained bicouplers).  I suppose we could do crazy things too,
+        # let's ignore that.
+        numEngines = [ numTowers, 2*numTowers, 3*numTowers, 4*numTowers ]
+        extraMass  = [ 0,
+            0.1 * numTowers,  # bicoupler
+            0.15 * numTowers, # tricoupler
+            0.3 * numTowers ] # bicoupler with 2 bicouplers under it
+    return (numEngines, extraMass)
+
 def suggestEngineNumbers(symmetry, numBaseTowers, deltaV, payload, engineType,
         altitude = None, planet = None,
         laterEngines = dict(), acceleration = None):
@@ -180,27 +270,17 @@ def suggestEngineNumbers(symmetry, numBaseTowers, deltaV, payload, engineType,
 
     We are required to have at least 25% of our thrust be vectoring at all
     times.  If we're violating that, return an empty list.
+
+    _suggestAllEngineNumbers makes the same choices for all engine types at
+    once; keep the two in sync.
     """
     # If we aren't asparagus staging (or this is the first stage), we need
     # a vectoring engine.
     if not laterEngines and not engineType.vectoring:
         return []
 
-    # How many towers do we have?
-    # If we only have no engines, or only radial engines above, we can fit
-    # on the base number of towers.  Otherwise we have a number of towers
-    # according to symmetry, attached to the side of the previous stage.  Then,
-    # further we can add any number of towers to this stage, according to
-    # symmetry.  I'm allowing up to 2 more steps.
-    for e in laterEngines:
-        if not e.radial:
-            numBaseTowers = symmetry
-            break
-    if engineType == engine.noEngine:
-        # don't try adding more of these to get more thrust!
-        numTowerChoices = [ numBaseTowers ]
-    else:
-        numTowerChoices = [ numBaseTowers + symmetry * i for i in range(3) ]
+    (numBaseTowers, numTowerChoices) = _towerChoices(symmetry, numBaseTowers,
+            engineType, laterEngines)
 
     def tryNumTowers(numTowers, nEnginesAttempted):
         """
@@ -208,42 +288,7 @@ def suggestEngineNumbers(symmetry, numBaseTowers, deltaV, payload, engineType,
         engines as possible.  Return None if we can't fit enough engines or
         the engine type is too weak, etc.
         """
-        # Count up how many engines we might be able to use.
-        # TODO: I'm not allowing mixing engine types.  In particular, you could
-        # have a stage with both standard and radial engines; or if you have
-        # more than one tower, you could use a bicoupler or tricoupler with 2
-        # types of engines.
-        if engineType == engine.noEngine:
-            # The "none" engine is just an asparagus fuel stage.
-            numEngines = [ 1 ]
-            extraMass = [ 0 ]
-        elif engineType.large:
-            # We can only fit one engine on each tower.
-            numEngines = [ numTowers ]
-            extraMass = [ 0 ]
-        elif engineType.radial:
-            # We can fit up to 8 Mark-55s, or 16 24-77s.
-            # But the part count gets ridiculous fast, so keep it much lower.
-            maxRadials = 4
-
-            if numTowers == 1:
-                # If we have one tower, we need to maintain symmetry.
-                maxEngines = int(math.ceil(maxRadials/symmetry))
-                numEngines = [ x * symmetry for x in range(1, maxEngines + 1) ]
-            else:
-                # Otherwise we can use any number, even a prime number.
-                numEngines = [ x * numTowers for x in range(1,maxRadials + 1) ]
-            extraMass = [ 0 for _ in range(len(numEngines)) ]
-        else:
-            # We can use 1, 2 (on a bicoupler), 3 (on a tricoupler), or 4 (on
-            # chained bicouplers).  I suppose we could do crazy things too,
-            # let's ignore that.
-            numEngines = [ numTowers, 2*numTowers, 3*numTowers, 4*numTowers ]
-            extraMass  = [ 0,
-                0.1 * numTowers,  # bicoupler
-                0.15 * numTowers, # tricoupler
-                0.3 * numTowers ] # bicoupler with 2 bicouplers under it
-
+        (numEngines, extraMass) = _engineCounts(symmetry, numTowers, engineType)
         for (n, xmass) in zip(numEngines, extraMass):
             if n in nEnginesAttempted: continue
             else: nEnginesAttempted.add(n)
@@ -291,6 +336,168 @@ def suggestEngineNumbers(symmetry, numBaseTowers, deltaV, payload, engineType,
 
     return choices
 
+# The candidates _suggestAllEngineNumbers lays out only depend on a few
+# things; see _candidateLayout.
+_candidateLayouts = dict()
+
+def _candidateLayout(symmetry, numBaseTowers, laterEngines):
+    """
+    Lay out the candidates (engine type, number of engines, number of
+    towers) for _suggestAllEngineNumbers.  Returns a pair:
+    * a list with, for each engine type, a triple (engine type, number of
+      towers the stage is built on, list of tower choices), where each
+      tower choice is a list of indices into the candidate arrays, fewest
+      engines first.
+    * a dictionary of candidate arrays: engine type index, number of engines,
+      extra mass, and so on.
+    """
+    nonRadial = any(not e.radial for e in laterEngines)
+    key = (symmetry, numBaseTowers, bool(laterEngines), nonRadial)
+    if key in _candidateLayouts:
+        return _candidateLayouts[key]
+
+    types = []
+    rows = dict( (name, []) for name in
+            ('type', 'engines', 'extraMass', 'towers') )
+    for (typeIdx, eType) in enumerate(engine.types):
+        if not laterEngines and not eType.vectoring:
+            continue
+        (baseTowers, numTowerChoices) = _towerChoices(symmetry, numBaseTowers,
+                eType, laterEngines)
+        towerRows = []
+        for numTowers in numTowerChoices:
+            (numEngines, extraMass) = _engineCounts(symmetry, numTowers, eType)
+            nrows = len(rows['engines'])
+            towerRows.append(range(nrows, nrows + len(numEngines)))
+            rows['type'].extend(typeIdx for _ in numEngines)
+            rows['engines'].extend(numEngines)
+            rows['extraMass'].extend(extraMass)
+            rows['towers'].extend(baseTowers for _ in numEngines)
+        types.append((eType, baseTowers, towerRows))
+
+    arrays = dict( (name, numpy.array(values, dtype = float))
+            for (name, values) in rows.iteritems() )
+    arrays['type'] = numpy.array(rows['type'], dtype = int)
+    typeArray = lambda f: numpy.array([ f(e) for e in engine.types ])[arrays['type']]
+    arrays['thrust'] = typeArray(lambda e: e.thrust).astype(float)
+    arrays['mass'] = typeArray(lambda e: e.mass).astype(float)
+    arrays['vectoring'] = typeArray(lambda e: e.vectoring).astype(bool)
+    # Python lists for the sequential walk over the candidates.
+    arrays['engineList'] = rows['engines']
+    arrays['extraMassList'] = rows['extraMass']
+
+    _candidateLayouts[key] = (types, arrays)
+    return (types, arrays)
+
+def _suggestAllEngineNumbers(symmetry, numBaseTowers, deltaV, payload,
+        altitude, planet, laterEngines, acceleration):
+    """
+    Equivalent to calling suggestEngineNumbers for every engine type, but
+    the Isp, masses, thrust and vectoring of every candidate (engine type,
+    number of engines, number of towers) are computed in one go with numpy.
+    We only build stage objects for the candidates suggestEngineNumbers
+    would have returned.
+    """
+    later = dict(laterEngines) if laterEngines else dict()
+    (types, rows) = _candidateLayout(symmetry, numBaseTowers, later)
+    if not types:
+        return []
+
+    laterThrust = sum(e.thrust * c for (e, c) in later.iteritems())
+    laterVectoring = sum(e.thrust * c for (e, c) in later.iteritems()
+            if e.vectoring)
+    laterWeight = sum(e.thrust * c / e.Isp(planet, altitude)
+            for (e, c) in later.iteritems() if c != 0 and e.thrust != 0)
+    typeWeight = numpy.array([ e.thrust / e.Isp(planet, altitude) if e.thrust else 0
+            for e in engine.types ])[rows['type']]
+
+    # See stage.__init__ and engine.combineIsp.
+    n = rows['engines']
+    typeThrust = rows['thrust'] * n
+    thrust = laterThrust + typeThrust
+    vectoringThrust = laterVectoring + numpy.where(rows['vectoring'], typeThrust, 0)
+    weight = laterWeight + typeWeight * n
+    with numpy.errstate(divide = 'ignore', invalid = 'ignore', over = 'ignore'):
+        Isp = numpy.where(thrust == 0, 0, thrust / weight)
+        dryMassNoTanks = ((payload + rows['extraMass']) + rows['mass'] * n
+                          + stage._decouplerConstant * rows['towers'])
+        # See engine.burnMass
+        if deltaV == 0:
+            alpha = numpy.ones_like(Isp)
+            weak = numpy.zeros(len(Isp), dtype = bool)
+        else:
+            alpha = numpy.exp(deltaV / (Isp * physics.g0))
+            weak = (Isp == 0) | (1 - alpha + engine.beta <= 0)
+        tankMass = dryMassNoTanks * (alpha - 1) / (1 - alpha + engine.beta)
+        propMass = (numpy.ceil(tankMass * engine.beta / rows['towers'])
+                    * rows['towers'])
+        tankMass = propMass / engine.beta
+        fullMass = (dryMassNoTanks + tankMass) + propMass
+    lacksVectoring = vectoringThrust < 0.25 * thrust
+    lacksThrust = thrust < acceleration * fullMass
+
+    # Walk the candidates in the order suggestEngineNumbers would.
+    weak = weak.tolist()
+    Isp = Isp.tolist()
+    lacksVectoring = lacksVectoring.tolist()
+    lacksThrust = lacksThrust.tolist()
+    numEngines = rows['engineList']
+    choices = []
+    for (eType, baseTowers, towerRows) in types:
+        typeIsp = eType.Isp(planet, altitude)
+        nEnginesAttempted = set()
+        for candidates in towerRows:
+            chosen = None
+            for row in candidates:
+                if numEngines[row] in nEnginesAttempted: continue
+                nEnginesAttempted.add(numEngines[row])
+                if weak[row]:
+                    if Isp[row] < typeIsp: continue
+                    else: break
+                if lacksVectoring[row]:
+                    if eType.vectoring: continue
+                    else: break
+                if lacksThrust[row]: continue
+                chosen = row
+                break
+            if chosen is None: continue
+            choices.append(stage(deltaV, payload + rows['extraMassList'][chosen],
+                    eType, numEngines[chosen], laterEngines, baseTowers,
+                    planet, altitude))
+            if eType.radial: break
+    return choices
+
+# Many partial solutions ask designStage for exactly the same stage: same
+# payload (i.e. same mass above), same burn, same engines available for
+# asparagus staging.  Remember the answers.
+stageMemo = LRUCache(20000)
+
+# If numpy is around, evaluate all the engine choices for a stage at once;
+# see _suggestAllEngineNumbers.
+vectorizeStages = numpy is not None
+
+# The telemetry.searchStats of the search that is running, if it wants
+# statistics; the hot paths below time themselves into it.
+activeStats = None
+
+# If set, round the payload up to a multiple of this many tonnes before
+# designing a stage, so that nearly identical requests share a memo entry.
+# Rounding up means we carry a little ballast, so the rocket still flies; but
+# the search is no longer exact.
+payloadQuantum = None
+
+def _stageMemoKey(symmetry, numBaseTowers, deltaV, payload, altitude, planet,
+        laterEngines, acceleration):
+    """
+    Canonical, hashable form of the arguments to designStage.  The later
+    engines are a multiset, so their order must not matter.
+    """
+    if laterEngines:
+        laterEngines = frozenset(dict(laterEngines).iteritems())
+    else:
+        laterEngines = frozenset()
+    return (symmetry, numBaseTowers, deltaV, payload, altitude, planet,
+            laterEngines, acceleration)
 
 def designStage(symmetry, numBaseTowers, deltaV, payload,
                 altitude, planet,
@@ -312,16 +519,35 @@ def designStage(symmetry, numBaseTowers, deltaV, payload,
     laterEngines: list of engines on upper stages that we can use in asparagus
         staging.
 
-    Returns a list of possibilities in arbitrary order.
+    Returns a list of possibilities in arbitrary order.  Results are
+    memoized in stageMemo; the list is a fresh copy, but the stages in it
+    are shared, so don't modify them.
     """
-    choices = []
-    for eType in engine.types:
-        choices.extend(
-            suggestEngineNumbers(symmetry, numBaseTowers, deltaV, payload,
-                    eType, altitude=altitude, planet=planet,
-                    acceleration = acceleration, laterEngines = laterEngines)
-        )
-    return choices
+    if payloadQuantum:
+        payload = math.ceil(payload / payloadQuantum) * payloadQuantum
+    key = _stageMemoKey(symmetry, numBaseTowers, deltaV, payload, altitude,
+            planet, laterEngines, acceleration)
+    choices = stageMemo.get(key)
+    if choices is not None:
+        return list(choices)
+
+    stats = activeStats
+    if stats is not None: start = time.time()
+    if vectorizeStages:
+        choices = tuple(_suggestAllEngineNumbers(symmetry, numBaseTowers,
+                deltaV, payload, altitude, planet, laterEngines, acceleration))
+    else:
+        choices = []
+        for eType in engine.types:
+            choices.extend(
+                suggestEngineNumbers(symmetry, numBaseTowers, deltaV, payload,
+                        eType, altitude=altitude, planet=planet,
+                        acceleration = acceleration, laterEngines = laterEngines)
+            )
+        choices = tuple(choices)
+    stageMemo[key] = choices
+    if stats is not None: stats.addTime('stage', time.time() - start)
+    return list(choices)
 
 ##############################
 #
@@ -346,6 +572,9 @@ def designStage(symmetry, numBaseTowers, deltaV, payload,
 # number of tons of propellant at each stage.
 
 class rawBurn(object):
+    __slots__ = ('name', 'deltaV', 'acceleration', 'payload', 'altitude',
+            'planet')
+
     def __init__(self, name, deltaV, accel, payload, altitude = None, planet = None):
         self.name = name
         self.deltaV = deltaV
@@ -385,6 +614,27 @@ class deepSpaceBurn(object):
                     self.payload))
         return burns
 
+# Missions that differ only in payload climb the same way, and simulating
+# the climb is the expensive part of setting up a liftoff burn.  Share the
+# climb slopes; they aren't modified once computed.  A long designSweep
+# asks for a great many, so keep only the recent ones.
+_climbSlopes = LRUCache(100)
+
+def _climbSlope(planet, orbit, initialAltitude, initialVelocity, acceleration):
+    if isinstance(initialVelocity, list):
+        velocityKey = tuple(initialVelocity)
+    else:
+        velocityKey = initialVelocity
+    key = (planet, orbit, initialAltitude, velocityKey, acceleration)
+    slope = _climbSlopes.get(key)
+    if slope is None:
+        slope = ascent.climbSlope(planet, orbit,
+            initialAltitude = initialAltitude,
+            initialVelocity = initialVelocity,
+            acceleration = acceleration)
+        _climbSlopes[key] = slope
+    return slope
+
 class liftoffBurn(object):
     def __init__(self, name, planet, orbit,
             acceleration = None, initialAltitude = 0, initialVelocity = None,
@@ -409,18 +659,17 @@ class liftoffBurn(object):
         self.name = name
         self.payload = payload
         self.planet = planet
-        self.slope = ascent.climbSlope(planet, orbit,
-            initialAltitude = initialAltitude,
-            initialVelocity = initialVelocity,
-            acceleration = acceleration)
+        self.slope = _climbSlope(planet, orbit, initialAltitude,
+            initialVelocity, acceleration)
         self.deltaV = self.slope.deltaV()
+        self.maxThrust = self.slope.maxThrust()
         if acceleration is not None:
             self.acceleration = acceleration
         else:
             # TODO: really we need acceleration to be by a given deltaV,
             # since the required acceleration changes over the climb (more
             # early and when the atmosphere starts to thin, less in between).
-            self.acceleration = max(x.thrust for x in self.slope._climbSlope)
+            self.acceleration = self.maxThrust
 
 
     def convert(self, n):
@@ -430,17 +679,17 @@ class liftoffBurn(object):
         # TODO: take account of Isp varying over pressure: instead of
         # splitting by equal deltaV we should split by equal Isp.
         burns = []
-        accel = max(x.thrust for x in self.slope._climbSlope)
+        accel = self.maxThrust
+        altitudes = self.slope.altitudesAtDeltaV(
+                [ self.deltaV * i / n for i in range(n) ], None)
         if n > 1:
             for i in range(n-1):
-                altitude = self.slope.altitudeAtDeltaV(self.deltaV * i / n, None)
                 burns.append(
                     rawBurn(self.name, self.deltaV / n, accel, 0,
-                        planet = self.planet, altitude = altitude)
+                        planet = self.planet, altitude = altitudes[i])
                 )
-        lastAltitude = self.slope.altitudeAtDeltaV(self.deltaV * (n-1) / n, None)
         burns.append(rawBurn(self.name, self.deltaV / n, accel,
-                    planet = self.planet, altitude = lastAltitude,
+                    planet = self.planet, altitude = altitudes[n-1],
                     payload = self.payload))
         return burns
 
@@ -461,10 +710,19 @@ class burnProfile(object):
     The burns come in order from top stage down, and are items with a
     convert(n) function that converts to a rawBurn.
     """
-    def __init__(self, rawburns):
+    def __init__(self, rawburns, maxIsp = None):
         self.rawburns = tuple(rawburns)
-        self.maxIsp = tuple( engine.maxIsp(b.planet, b.altitude if b.planet else None)
-                for b in rawburns )
+        if maxIsp is None:
+            maxIsp = ( engine.maxIsp(b.planet, b.altitude if b.planet else None)
+                for b in self.rawburns )
+        self.maxIsp = tuple(maxIsp)
+
+    def lowerBound(self):
+        """
+        Lower bound on the launch mass of any rocket flying this profile.
+        Symmetry doesn't enter into the bound.
+        """
+        return partialSolution(self, nil, 1, 1).bestMass
 
     def __str__(self):
         # Intended just for debugging...
@@ -486,13 +744,20 @@ class partialSolution(object):
     Set up a partial solution with the given upper stages already
     selected.  Keep track of the required symmetry.
     If this is the first stage, set the payload.
+
+    These are the nodes of the search, so there are a lot of them: they're
+    slotted, and not modified once built (bar caching the signature).
     """
+    __slots__ = ('profile', 'stages', 'symmetry', 'numBaseTowers', 'complete',
+            '_signature', 'currentMass', 'bestMass')
+
     def __init__(self, profile, stages, symmetry = None, numBaseTowers = None):
         self.profile  = profile
         self.stages   = stages
         self.symmetry = symmetry
         self.numBaseTowers = numBaseTowers
         self.complete = profile is None or (len(stages) == len(profile.rawburns))
+        self._signature = None
         if symmetry is None or numBaseTowers is None:
             assert self.complete
             assert stages
@@ -507,6 +772,8 @@ class partialSolution(object):
             allEngines = stage.collectUsableEngines(stages)
 
             # For all lower stages, lower-bound the mass they will need.
+            stats = activeStats
+            if stats is not None: start = time.time()
             try:
                 for i in xrange(len(stages), len(profile.rawburns)):
                     (bestMass, allEngines) = self._lowerBound(
@@ -516,6 +783,7 @@ class partialSolution(object):
                 # Totally impossible even with the best engines.  Set this to
                 # basically infinite lower bound.
                 self.bestMass = 1e30
+            if stats is not None: stats.addTime('lowerBound', time.time() - start)
 
     def __lt__(self, other):
         if other is None:
@@ -533,6 +801,52 @@ class partialSolution(object):
         else:
             return len(self.profile.rawburns) - len(self.stages)
 
+    def objectives(self):
+        """
+        The objectives of a Pareto search (see paretoArchive): launch mass,
+        number of engines, and number of towers summed over the stages.
+        These are lower bounds for the completions of a partial solution,
+        and exact for a complete one.
+        """
+        engines = 0
+        towers = 0
+        for s in self.stages:
+            if s.engineType is not engine.noEngine:
+                engines += s.numEngines
+            towers += s.numTowers
+        # Every stage to come has at least one tower.
+        return (self.bestMass, engines, towers + self.remainingStages())
+
+    def transpositionKey(self):
+        """
+        Two partial solutions with the same key, and the same current mass,
+        expand identically from here on: they have the same burns left to
+        do, the same towers to build on, and the same engines available for
+        asparagus staging.
+        """
+        engines = stage.collectUsableEngines(self.stages)
+        return (self.profile, len(self.stages), self.symmetry,
+                self.numBaseTowers, self.stages.head.numTowers,
+                frozenset(engines.iteritems()))
+
+    def signature(self):
+        """
+        Identify the path to this partial solution: the choices made for
+        each stage so far.  Iterative deepening revisits the same path,
+        though not the same objects.
+
+        The signature is a tuple, not a hash of one: the completion cache
+        and the transposition table compare signatures for equality, and a
+        collision would hand one path another's results.  Engines go in by
+        name so the signature survives a checkpoint.
+        """
+        if self._signature is None:
+            self._signature = tuple(
+                (s.engineType.name, s.numEngines, s.numTowers, s.asparagus,
+                 s.propellantMass)
+                for s in self.stages )
+        return self._signature
+
     def _lowerBound(self, decouplers, numTowers, allEngines, mass, i):
         """
         Lower bound the mass we'll need at stage i (where 0 is the top
@@ -623,11 +937,32 @@ class partialSolution(object):
             laterEngines = dict()) )# standard staging: no later engines for use
         list.sort(options, key = lambda x: x.fullMass) # critical!
         solutions = []
+        seen = set()
         for s in options:
+            # The stages below only see the mass of this one, the towers it
+            # stands on, and the engines they can use (see
+            # transpositionKey); its own thrust and Isp only had to fly its
+            # own burn, which every option does.  An option that matches a
+            # lighter one on those, and on its number of engines, can't lead
+            # anywhere better: skip it before paying for its lower bound.
+            # Anything looser isn't safe: extra engines below raise the
+            # thrust but can drag down the Isp the lower stages get.
+            if s.asparagus:
+                usable = s.collectEngines(dict(engines))
+            else:
+                usable = s.collectEngines()
+            key = (s.numTowers, s.numEngines, frozenset(usable.iteritems()))
+            if key in seen:
+                continue
+            seen.add(key)
             nextstages = cons(s, self.stages)
             partial = partialSolution(self.profile, nextstages,
                         self.symmetry, self.numBaseTowers)
             solutions.append(partial)
+        if activeStats is not None:
+            activeStats.extends += 1
+            activeStats.children += len(solutions)
+            activeStats.dominated += len(options) - len(solutions)
         return solutions
 
     def __str__(self):
@@ -640,43 +975,527 @@ class partialSolution(object):
         return "\n".join(strs)
 
 
-def designRocket(profiles, massToBeat = None,
-        analyst = None, symmetries = 2, numBaseTowers = 1):
-    if isinstance(symmetries, Number): symmetries = (symmetries,)
-    if isinstance(numBaseTowers, Number): numBaseTowers = (numBaseTowers,)
-    assert len(symmetries) == len(numBaseTowers)
+class paretoArchive(object):
+    """
+    The complete designs that no other design we know of matches or beats
+    on every objective (see partialSolution.objectives): the trade-off curve
+    between launch mass and part count.
+    """
+    def __init__(self):
+        self.entries = [] # (objectives, solution) pairs
+
+    def dominates(self, objectives):
+        """
+        Return True if some design in the archive is at least as good as the
+        given objectives on every count.
+        """
+        (mass, engines, towers) = objectives
+        for ((m, e, t), _) in self.entries:
+            if m <= mass and e <= engines and t <= towers:
+                return True
+        return False
+
+    def add(self, solution):
+        """
+        Add the complete solution, unless it's dominated; drop the designs
+        it dominates.  Returns True if it was added.
+        """
+        objectives = solution.objectives()
+        if self.dominates(objectives):
+            return False
+        (mass, engines, towers) = objectives
+        self.entries = [ ((m, e, t), s) for ((m, e, t), s) in self.entries
+                if not (mass <= m and engines <= e and towers <= t) ]
+        self.entries.append( (objectives, solution) )
+        return True
+
+    def front(self):
+        """
+        The solutions in the archive, lightest first.
+        """
+        return [ s for (_, s) in sorted(self.entries, key = lambda x: x[0]) ]
+
+    def __len__(self): return len(self.entries)
+
+
+class SearchBudgetException(Exception):
+    """Raised inside designSearch when it has used up its budget."""
+    pass
+
+
+class searchRoot(object):
+    """
+    The iterative search under one root candidate: its completions in
+    iterative deepening order (see designSearch.generateSolutions).
+
+    Unlike a bare generator, a root remembers how far it got -- the depth,
+    and the path of child indices to the completion it's on -- so it can be
+    pickled in a checkpoint, and picks up from there when it's unpickled.
+    It also holds the children along the path (see semiGreedySolutions),
+    which is what it keeps open; those get rebuilt rather than pickled.
+    """
+    def __init__(self, search, candidate):
+        self.search = search
+        self.candidate = candidate
+        self.depth = 0
+        self.cursor = []
+        self.stack = []
+        self._solutions = None
+
+        # Bookkeeping for priorityScheduler.
+        self.credit = 0
+        self.improvementRate = 0
+
+    def next(self):
+        if self._solutions is None:
+            self._solutions = self.search.generateSolutions(self)
+        return self._solutions.next()
+
+    def lowerBound(self):
+        """
+        Lower bound on the launch mass of the completions under this root.
+        Iterative deepening will come back to all of them, so rather than
+        what's left of this pass, we bound the whole tree: the children
+        along the path, bar the ones on it, and the last one on it, between
+        them hold every completion.  That's usually tighter than the bound
+        the candidate had when we made it.
+        """
+        bound = self.candidate.bestMass
+        if not self.stack:
+            return bound
+        least = min(c.bestMass for c in self.stack[-1])
+        for (children, i) in zip(self.stack[:-1], self.cursor):
+            for (j, c) in enumerate(children):
+                if j != i and c.bestMass < least:
+                    least = c.bestMass
+        return max(bound, least)
+
+    def __getstate__(self):
+        # The search reattaches itself when it's unpickled; the generator
+        # gets restarted from the cursor.
+        state = dict(self.__dict__)
+        state['search'] = None
+        state['_solutions'] = None
+        state['stack'] = []
+        return state
+
+
+class roundRobinScheduler(object):
+    """
+    Schedules the roots of the iterative search (see designSearch.run): each
+    pass gives every root one step, in order.
+    """
+    def runPass(self, search, roots):
+        """
+        Step through the roots once.  Roots suggested during the pass are
+        appended, and wait for the next pass.  On return, even by an
+        exception, roots holds only the roots that aren't exhausted.
+        """
+        n = len(roots)
+        i = 0
+        j = 0
+        try:
+            while i < n:
+                if not search.step(roots, i):
+                    # We keep this one by copying it to the last unused
+                    # location (which is, usually, i)
+                    roots[j] = roots[i]
+                    j += 1
+                i += 1
+        finally:
+            # roots[:j] have been kept, and roots[i:] are yet to go, or
+            # were added during the pass.
+            roots[j:] = roots[i:]
+
+
+class priorityScheduler(roundRobinScheduler):
+    """
+    Schedules the roots of the iterative search, sharing out the steps of a
+    pass by how promising each root is.  The most promising root gets one
+    step per pass; a root with weight w gets a step every 1/w passes, where
+    w (relative to the most promising) is
+
+        (least bound / its bound) ** sharpness * (1 + boost * improvement rate)
+
+    The bound is the root's current lower bound on the launch mass (see
+    searchRoot.lowerBound), which tightens as its search goes deeper; the
+    improvement rate counts the better designs the root found in recent passes, decayed
+    by the given factor each pass.
 
-    # bestKnown is None, a number in tonnes, or the best actual solution we've found
-    bestKnown = massToBeat
+    On missions with a great many profiles, this spends most of the time on
+    the profiles that could give the lightest rockets, while still getting
+    to all of them.
+    """
+    def __init__(self, sharpness = 4, boost = 4, decay = 0.9):
+        self.sharpness = sharpness
+        self.boost = boost
+        self.decay = decay
+
+    def weight(self, root, bound, leastBound):
+        return ((leastBound / bound) ** self.sharpness
+                * (1 + self.boost * root.improvementRate))
+
+    def runPass(self, search, roots):
+        n = len(roots)
+        if n == 0: return
+        bounds = [ root.lowerBound() for root in roots ]
+        leastBound = min(bounds)
+        weights = [ self.weight(root, bound, leastBound)
+                for (root, bound) in zip(roots, bounds) ]
+        most = max(weights)
+        i = 0
+        j = 0
+        try:
+            while i < n:
+                root = roots[i]
+                root.credit += weights[i] / most
+                improvements = search.nimprovements
+                done = False
+                while root.credit >= 1 and not done:
+                    done = search.step(roots, i)
+                    root.credit -= 1
+                root.improvementRate = (self.decay * root.improvementRate
+                        + search.nimprovements - improvements)
+                if not done:
+                    roots[j] = roots[i]
+                    j += 1
+                i += 1
+        finally:
+            roots[j:] = roots[i:]
 
-    # trees is roughly speaking the list of profiles we're still pursuing
-    trees = [ ]
 
+class designSearch(object):
+    """
+    The state of a branch-and-bound search over a set of burn profiles: the
+    best known solution, and the machinery to walk the tree of partial
+    solutions under each profile.
+
+    The strategy is either "iterative", which round-robins over the profiles
+    doing iterative deepening on each (see generateSolutions), or
+    "bestfirst" (see runBestFirst).
+
+    Pass in a multiprocessing RawValue as sharedBest to share the best known
+    mass with other processes searching other profiles; see
+    _searchInParallel.
+
+    If checkpoint names a file, the state of the search is saved to it every
+    checkpointInterval seconds, and when the user hits C-c.  Load it with
+    designSearch.load and continue with resume.  Checkpointing needs the
+    profiles to be picklable: any other iterable of them is read into a
+    list up front.  The search saves a first checkpoint before it starts,
+    so anything else that doesn't pickle fails right away.
+
+    The search can be given a budget: a deadline (as from time.time()) or a
+    maximum number of expansions; it stops when either runs out.  onImprove
+    is called with each new best solution.
+
+    Pass a telemetry.searchStats as stats to collect statistics.
+
+    The iterative search hands out steps to its roots with the scheduler,
+    a roundRobinScheduler by default; see also priorityScheduler.
+
+    If pareto is True, rather than the lightest design, the search looks for
+    the Pareto front of launch mass, engine count and tower count, in
+    self.archive (see paretoArchive).  It only prunes partial solutions
+    that a design in the archive beats on all three.  The analyst doesn't
+    improve the designs, just suggests profiles.
+    """
     # Should we prune?  If the best known is an actual solution, we want pursue
     # a candidate if it might reduce the mass by at least 1%.  Less reduction,
     # we don't really care.
     improvementRatio = 1
-    def shouldKeep(candidate):
-        if isinstance(bestKnown, partialSolution):
-            if candidate.bestMass <= improvementRatio * bestKnown.bestMass:
+
+    # How many partial solutions to remember in the transposition table.
+    transpositionTableSize = 100000
+
+    # How many greedy completions to remember.
+    completionCacheSize = 100000
+
+    # How many partial solutions the best-first search may keep open before
+    # it falls back to depth-first.
+    maxFrontier = 200000
+    _notCached = object()
+
+    def __init__(self, symmetries, numBaseTowers, massToBeat = None,
+            analyst = None, sharedBest = None, sharedLock = None,
+            verbose = True, strategy = "iterative", checkpoint = None,
+            checkpointInterval = 300, deadline = None, maxExpansions = None,
+            onImprove = None, stats = None, pareto = False, scheduler = None):
+        self.symmetries = symmetries
+        self.numBaseTowers = numBaseTowers
+        self.analyst = analyst
+        self.sharedBest = sharedBest
+        self.sharedLock = sharedLock
+        self.verbose = verbose
+        assert strategy in ("iterative", "bestfirst")
+        self.strategy = strategy
+
+        # bestKnown is None, a number in tonnes, or the best actual solution
+        # we've found
+        self.bestKnown = massToBeat
+        self.nexpansions = 0
+        self.nimprovements = 0
+
+        self.ntranspositions = 0
+        self.ncompletionsReused = 0
+        self._makeCaches()
+
+        # What's left to search: the open roots and the profiles we haven't
+        # started on for the iterative search, the open partial solutions
+        # for the best-first search.
+        self.roots = []
+        self.pending = None
+        self.frontier = []
+        self.order = 0 # break ties in the frontier first-come, first-served
+
+        self.checkpoint = checkpoint
+        self.checkpointInterval = checkpointInterval
+        self.lastCheckpoint = time.time()
+
+        self.deadline = deadline
+        self.maxExpansions = maxExpansions
+        self.outOfBudget = False
+        self.onImprove = onImprove
+        self.stats = stats
+        self.archive = paretoArchive() if pareto else None
+        self.scheduler = scheduler if scheduler is not None else roundRobinScheduler()
+
+    def _makeCaches(self):
+        # Maps partialSolution.transpositionKey to the lightest (mass,
+        # signature) we've seen with that key.  Set the size to 0 to disable.
+        if self.transpositionTableSize:
+            self.transpositions = LRUCache(self.transpositionTableSize)
+        else:
+            self.transpositions = None
+
+        # Maps a partial solution (its profile, symmetry, and signature) to
+        # its greedy completion, or None if that got pruned.
+        self.completions = LRUCache(self.completionCacheSize)
+
+    def __getstate__(self):
+        # The caches are keyed on object identities, which don't survive
+        # pickling; they refill quickly.  Shared memory doesn't pickle at all.
+        state = dict(self.__dict__)
+        for name in ('transpositions', 'completions', 'sharedBest', 'sharedLock',
+                'onImprove', 'stats'):
+            state[name] = None
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._makeCaches()
+        for root in self.roots:
+            root.search = self
+
+    @staticmethod
+    def load(filename):
+        """
+        Load a search from a checkpoint file.
+        """
+        with open(filename, "rb") as f:
+            return pickle.load(f)
+
+    def saveCheckpoint(self):
+        """
+        Save the state of the search to the checkpoint file.  We write a
+        temporary file and rename it over the checkpoint, so a crash midway
+        leaves the previous checkpoint intact.
+        """
+        tmpname = self.checkpoint + ".tmp"
+        try:
+            with open(tmpname, "wb") as f:
+                pickle.dump(self, f, pickle.HIGHEST_PROTOCOL)
+                f.flush()
+                os.fsync(f.fileno())
+        except:
+            # Don't leave half a checkpoint lying around.
+            if os.path.exists(tmpname):
+                os.remove(tmpname)
+            raise
+        os.rename(tmpname, self.checkpoint)
+        self.lastCheckpoint = time.time()
+
+    def maybeCheckpoint(self):
+        if (self.checkpoint and
+                time.time() >= self.lastCheckpoint + self.checkpointInterval):
+            self.saveCheckpoint()
+
+    def shouldKeep(self, candidate):
+        keep = self._shouldKeep(candidate)
+        if self.stats is not None:
+            if keep:
+                self.stats.kept += 1
+            else:
+                self.stats.pruned += 1
+        return keep
+
+    def shouldKeepRoot(self, root):
+        """
+        Return False if the root can't lead to anything better than the best
+        known solution, judging by its current lower bound (see
+        searchRoot.lowerBound).  The stats count the roots this retires.
+        """
+        keep = self._shouldKeep(root.candidate, root.lowerBound())
+        if not keep and self.stats is not None:
+            self.stats.retired += 1
+        return keep
+
+    def _shouldKeep(self, candidate, bound = None):
+        # bound, if given, is a tighter lower bound on the launch mass of the
+        # candidate's completions than its own.
+        mass = candidate.bestMass if bound is None else bound
+
+        # Another process may know of a better solution than we do.  Reading
+        # a double is atomic, so we don't bother with the lock.
+        if (self.sharedBest is not None and
+                mass > self.improvementRatio * self.sharedBest.value):
+            return False
+
+        bestKnown = self.bestKnown
+        if self.archive is not None:
+            if (not isinstance(bestKnown, partialSolution) and
+                    bestKnown is not None and not (mass < bestKnown)):
+                return False
+            return not self.archive.dominates(
+                    (mass,) + candidate.objectives()[1:])
+        elif isinstance(bestKnown, partialSolution):
+            if mass <= self.improvementRatio * bestKnown.bestMass:
                 return True
         else:
-            return candidate < bestKnown
+            return bestKnown is None or mass < bestKnown
+
+    def isTransposition(self, candidate):
+        """
+        Return True if another branch of the search already reached a
+        partial solution equivalent to the candidate (see
+        partialSolution.transpositionKey) with no more mass.  Expanding the
+        candidate would just repeat that work, or do worse.
+
+        Otherwise, remember the candidate and return False.
+
+        In a Pareto search, the other partial solution must also have no
+        more engines or towers.
+        """
+        table = self.transpositions
+        if table is None or candidate.complete or not candidate.stages:
+            return False
+        key = candidate.transpositionKey()
+        signature = candidate.signature()
+        parts = candidate.objectives()[1:] if self.archive is not None else None
+        entry = table.get(key)
+        if entry is not None:
+            (mass, seenSignature, seenParts) = entry
+            if seenSignature == signature:
+                # Same path, revisited by iterative deepening.
+                return False
+            if mass <= candidate.currentMass and (parts is None or
+                    (seenParts[0] <= parts[0] and seenParts[1] <= parts[1])):
+                self.ntranspositions += 1
+                return True
+        table[key] = (candidate.currentMass, signature, parts)
+        return False
+
+    def checkBudget(self):
+        """
+        Raise SearchBudgetException if we've run out of time or expansions.
+        """
+        if ((self.maxExpansions is not None
+                    and self.nexpansions >= self.maxExpansions) or
+                (self.deadline is not None and time.time() >= self.deadline)):
+            self.outOfBudget = True
+            raise SearchBudgetException()
+
+    def lowerBound(self):
+        """
+        Lower bound on the launch mass of any solution for the profiles: the
+        least bound over the best known solution, the open roots (see
+        searchRoot.lowerBound) or frontier, and the profiles not yet started
+        on (see profileStream.lowerBound).  Returns infinity if there is no
+        solution at all.
+        """
+        bounds = [ float("inf") ]
+        if isinstance(self.bestKnown, partialSolution):
+            bounds.append(self.bestKnown.bestMass)
+        if self.frontier:
+            bounds.append(self.frontier[0][0])
+        bounds.extend(root.lowerBound() for root in self.roots)
+        if isinstance(self.pending, collections.deque):
+            bounds.extend(c.bestMass for c in self.makeCandidates(self.pending))
+        elif isinstance(self.pending, profileStream):
+            bounds.append(self.pending.lowerBound())
+        return min(bounds)
+
+    def setBest(self, solution):
+        if self.archive is not None:
+            # Any design on the front is news; the best known stays the
+            # lightest.
+            self.archive.add(solution)
+            if not isinstance(self.bestKnown, partialSolution) or solution < self.bestKnown:
+                self.bestKnown = solution
+        else:
+            self.bestKnown = solution
+        self.nimprovements += 1
+        self.publish(solution)
+        if self.onImprove:
+            self.onImprove(solution.stages)
+        if self.stats:
+            self.stats.improved(self)
+
+    def startStats(self):
+        global activeStats
+        activeStats = self.stats
+
+    def finishStats(self):
+        global activeStats
+        activeStats = None
+        if self.stats:
+            self.stats.finish(self)
+
+    def publish(self, solution):
+        """
+        Let the other processes know about a new best solution.
+        """
+        if self.sharedBest is None: return
+        with self.sharedLock:
+            if solution.bestMass < self.sharedBest.value:
+                self.sharedBest.value = solution.bestMass
 
-    def greedySolution(partial):
+    def greedySolution(self, partial):
         """
         Greedily extend the partial solution to completion.
         Return None if the greedy solution got pruned, or no solution exists.
+
+        Every partial solution along the way is recorded in the completion
+        cache, since the greedy completion of any of them is the same as
+        ours; iterative deepening will ask for them again at deeper levels.
         """
+        path = []
+        completion = None
         while not partial.complete:
-            if not shouldKeep(partial):
-                return
+            key = (partial.profile, partial.symmetry, partial.numBaseTowers,
+                    partial.signature())
+            cached = self.completions.get(key, self._notCached)
+            if cached is not self._notCached:
+                self.ncompletionsReused += 1
+                completion = cached
+                break
+            path.append(key)
+            if not self.shouldKeep(partial) or self.isTransposition(partial):
+                break
             children = partial.extend()
-            if not children: return
+            if not children: break
             partial = children[0]
-        return partial
+        else:
+            completion = partial
+
+        # Pruning only gets tighter as the search goes on, so a completion
+        # that got pruned will stay pruned.
+        for key in path:
+            self.completions[key] = completion
+        return completion
 
-    def semiGreedySolutions(candidate, depth):
+    def semiGreedySolutions(self, candidate, depth, cursor = None, resume = None,
+            stack = None):
         """
         Returns a generator that allows iterating over greedy completions of
         all possibilities of engine choice for the top 'depth' stages.
@@ -693,22 +1512,56 @@ def designRocket(profiles, massToBeat = None,
         precisely wrong.  Breadth-first with greedy extension does an
         exhaustive search of upper-stage engines and doesn't worry much about
         the low-stage engines.
+
+        As we descend, the children at each level are pushed on stack, and
+        the index of the child we're in on cursor: stack[k][cursor[k]] is
+        the partial solution k+1 stages down the path.  Passing a former
+        cursor as resume skips ahead to it.
+
+        The walk is a loop over the stack, rather than a generator per
+        level, so yielding costs the same at any depth.
         """
-        if not shouldKeep(candidate):
-            yield None
-            return
+        if cursor is None:
+            cursor = []
+        if stack is None:
+            stack = []
+        partial = candidate
+        while True:
+            level = len(stack)
+            if not self.shouldKeep(partial) or self.isTransposition(partial):
+                yield None
+            elif level == depth:
+                yield self.greedySolution(partial)
+            else:
+                # Descend into the first child, or the one we're resuming.
+                children = partial.extend()
+                i = resume[level] if resume and level < len(resume) else 0
+                if i < len(children):
+                    stack.append(children)
+                    cursor.append(i)
+                    partial = children[i]
+                    continue
 
-        if depth == 0:
-            yield greedySolution(candidate)
-        else:
-            for child in candidate.extend():
-                for x in semiGreedySolutions(child, depth - 1):
-                    yield x
+            # Move on to the next sibling, backing up as levels run out.
+            # We only resume into the first path we take.
+            resume = None
+            while stack:
+                i = cursor[-1] + 1
+                children = stack[-1]
+                if i < len(children):
+                    cursor[-1] = i
+                    partial = children[i]
+                    break
+                stack.pop()
+                cursor.pop()
+            else:
+                return
 
-    def generateSolutions(candidate):
+    def generateSolutions(self, root):
         """
         Create a generator that allows iterating in over all the
-        completions of the candidate.
+        completions of the root's candidate, starting from where the root
+        says it got to (see searchRoot).
 
         Yields None periodically if the search is being unfruitful, to allow
         trying other search trees in parallel.
@@ -716,31 +1569,61 @@ def designRocket(profiles, massToBeat = None,
         The search order is iterative deepening: all depth-0 solutions, then
         all depth-1 solutions, ...
         """
-        # TODO: The algorithm repeats solutions: at depth 1, the first greedy
+        # The algorithm repeats solutions: at depth 1, the first greedy
         # solution is exactly the depth 0 greedy solution.  At depth 2, the
         # first is again the depth 0 greedy solution, but also for each child
         # of the candidate, the first greedy solution is also the corresponding
         # depth-1 greedy solution.  So the first greedy solution of a leaf is
         # repeated up to n times on an n-stage rocket -- though pruning can
-        # reduce that.  Might be nice to fix.
+        # reduce that.  greedySolution caches the completions so that each is
+        # only computed once.
 
         # Note: If we have 1 stage remaining, the greedy solution is optimal,
-        # so the upper bound on the range is correct.
-        for depth in xrange(candidate.remainingStages()):
-            for soln in semiGreedySolutions(candidate, depth):
+        # so the upper bound on the range is correct.  Not so for a Pareto
+        # search: a heavier last stage may have fewer parts.
+        # Resuming re-yields the completion the cursor is on; no harm done.
+        candidate = root.candidate
+        resume = list(root.cursor)
+        maxDepth = candidate.remainingStages()
+        if self.archive is not None:
+            maxDepth += 1
+        for depth in xrange(root.depth, maxDepth):
+            root.depth = depth
+            root.cursor = []
+            root.stack = []
+            for soln in self.semiGreedySolutions(candidate, depth,
+                    root.cursor, resume, root.stack):
                 yield soln
+            resume = None
 
-    def makeRoots(profiles):
-        candidates = [ partialSolution(profile, nil, symmetry, numBase)
+    def makeCandidates(self, profiles):
+        """
+        The empty partial solutions at the root of the search, one per
+        profile and symmetry pair.
+        """
+        return [ partialSolution(profile, nil, symmetry, numBase)
             for profile in profiles
-            for (symmetry, numBase) in zip(symmetries, numBaseTowers) ]
+            for (symmetry, numBase) in zip(self.symmetries, self.numBaseTowers) ]
 
-        roots = [ generateSolutions(candidate) for candidate in candidates ]
-        return roots
+    def makeRoots(self, profiles):
+        return [ searchRoot(self, candidate)
+            for candidate in self.makeCandidates(profiles) ]
 
-    def process(generator):
+    def report(self, newBest):
+        """
+        Print out a new best solution.
         """
-        Move this generator along by one iterate, and return a pair
+        if not self.verbose:
+            return
+        elif not self.analyst:
+            print ("Improved solution: %s" % newBest)
+        else:
+            self.analyst.prettyPrint(newBest.stages,
+                    self.analyst.analyze(newBest.stages))
+
+    def process(self, root):
+        """
+        Move this root along by one iterate, and return a triple
         (newBest, finished, profiles) where:
         * newBest is usually None, but otherwise is a new solution better
             than the best known
@@ -751,90 +1634,468 @@ def designRocket(profiles, massToBeat = None,
         # try to push it a bit further (might not work: we might prune everything,
         # or the last one we got might have been the last solution to search)
         try:
-            candidate = generator.next()
+            candidate = root.next()
         except StopIteration:
             return (None, True, [])
 
         # Check if we improved the best known solution
         assert (not candidate) or (candidate.complete)
-        if (not candidate) or (not (candidate < bestKnown)):
+        if not candidate:
             return (None, False, [])
+        (newBest, profiles) = self.improve(candidate)
+        return (newBest, False, profiles)
+
+    def improve(self, candidate):
+        """
+        Given a complete candidate, return a pair (newBest, profiles):
+        * newBest is None if the candidate doesn't beat the best known
+            solution; otherwise it's the candidate, perhaps locally improved
+            by the analyst.
+        * profiles is a new list of profiles to try that might bring improvement
+
+        In a Pareto search, newBest is any candidate that joins the front,
+        as it is: which designs we'd improve would depend on the order we
+        found them in, and so would the front.
+        """
+        if self.archive is not None:
+            if self.archive.dominates(candidate.objectives()):
+                return (None, [])
+        elif not (candidate < self.bestKnown):
+            return (None, [])
 
         # Improvement!
         newBest = candidate
+        analyst = self.analyst
         if not analyst:
-            print ("Improved solution: %s" % newBest)
-            return (newBest, False, [])
+            self.report(newBest)
+            return (newBest, [])
         else:
             # See if we have any good ideas for potentially improved stagings.
             # Optimality is violated right here: we only suggest for solutions
             # that are better than any prior.  That means we might miss a non-
             # optimal solution could have been locally improved to
             # the global optimum.
+            if self.stats: start = time.time()
             analysis = analyst.analyze(newBest.stages)
             (improvement, profiles) = analyst.suggest(newBest.stages, analysis)
             profiles = list(profiles)
+            if self.stats: self.stats.addTime('analyst', time.time() - start)
 
             # Do only one round of improvement; assumption is the analyst
             # already looped.
-            if improvement and improvement.head.fullMass < newBest.currentMass:
+            if (self.archive is None and improvement
+                    and improvement.head.fullMass < newBest.currentMass):
                 asPartial = partialSolution(None, LinkedList(improvement))
                 assert (asPartial < newBest)
                 newBest = asPartial
-                analysis = analyst.analyze(newBest.stages)
 
-            analyst.prettyPrint(newBest.stages, analysis)
-            return (newBest, False, profiles)
+            self.report(newBest)
+            return (newBest, profiles)
+
+    def search(self, profiles):
+        """
+        Search for rockets that fly the profiles, with the search strategy
+        we were set up with.  Returns the best known solution.
+
+        The iterative search pulls profiles from the iterable as it goes, so
+        they can be generated lazily (see splitBurns).  The best-first
+        search needs them all up front: a profile we haven't seen yet might
+        have the lowest bound.
+        """
+        if self.strategy == "bestfirst":
+            return self.runBestFirst(self.makeCandidates(profiles))
+        elif self.checkpoint and not isinstance(profiles, profileStream):
+            # A generator doesn't pickle; a list does.
+            profiles = list(profiles)
+        if isinstance(profiles, list):
+            return self.run([], collections.deque(profiles))
+        else:
+            return self.run([], iter(profiles))
+
+    def searchCandidates(self, candidates):
+        """
+        Like search, but for the given root candidates (see makeCandidates).
+        """
+        if self.strategy == "bestfirst":
+            return self.runBestFirst(candidates)
+        else:
+            return self.run([ searchRoot(self, c) for c in candidates ])
+
+    def resume(self):
+        """
+        Continue a search loaded from a checkpoint.  Returns the best known
+        solution.
+        """
+        if self.strategy == "bestfirst":
+            return self.runBestFirst([])
+        else:
+            return self.run(self.roots, self.pending)
+
+    def nextProfile(self):
+        """
+        Pull the next pending profile, or return None if there are none left.
+        """
+        if isinstance(self.pending, collections.deque):
+            return self.pending.popleft() if self.pending else None
+        return next(self.pending, None)
+
+    def run(self, roots, profiles = None):
+        """
+        Search the given roots until they are exhausted, or until the user
+        hits C-c.  Returns the best known solution.
+
+        If profiles is an iterator (or a deque), each pass over the roots
+        pulls one more profile from it and adds its roots.  The scheduler
+        decides how to spend each pass (see roundRobinScheduler); roots that
+        can no longer beat the best known solution are dropped before it
+        starts.
+        """
+        self.roots = roots = list(roots)
+        self.pending = profiles
+        if self.checkpoint:
+            self.saveCheckpoint()
+        self.startStats()
+        try:
+            nexpansionsLastPrinted = self.nexpansions
+            if self.verbose and profiles is None:
+                print ("Starting to search %d configurations" % (len(roots)))
+            while roots or self.pending is not None:
+                self.maybeCheckpoint()
+                if self.pending is not None:
+                    profile = self.nextProfile()
+                    if profile is None:
+                        self.pending = None
+                    else:
+                        if self.verbose:
+                            print ("Searching profile: %s" % profile)
+                        roots.extend(self.makeRoots([ profile ]))
+
+                # Retire the roots that can't lead to anything better, then
+                # make a pass over the rest, expanding them further.  Any
+                # suggested new profiles will be appended, and therefore
+                # processed later in the loop.
+                roots[:] = [ root for root in roots
+                        if self.shouldKeepRoot(root) ]
+                self.scheduler.runPass(self, roots)
+
+                # let the user know things are moving along
+                if self.nexpansions >= nexpansionsLastPrinted + 1000:
+                    nexpansionsLastPrinted = self.nexpansions
+                    if self.verbose:
+                        print ("%d choices considered, %d avenues remain"
+                                % (self.nexpansions, len(roots)) )
+
+            if self.verbose:
+                print ("Completed search after %d evaluations, %d transpositions pruned, "
+                       "%d greedy completions reused"
+                        % (self.nexpansions, self.ntranspositions,
+                           self.ncompletionsReused))
+        except (KeyboardInterrupt, SearchBudgetException), e:
+            # The scheduler left the roots in order, even partway through a
+            # pass.
+            if self.checkpoint:
+                self.saveCheckpoint()
+            if self.verbose:
+                print ("%s search after %d evaluations"
+                        % ("Cancelled" if isinstance(e, KeyboardInterrupt)
+                            else "Out of budget; stopped", self.nexpansions))
+                if self.checkpoint:
+                    print ("Saved the search to %s" % self.checkpoint)
+            elif isinstance(e, KeyboardInterrupt):
+                raise
+        finally:
+            self.finishStats()
+
+        return self.bestKnown
+
+    def step(self, roots, i):
+        """
+        Expand roots[i] by one iterate, appending any newly suggested roots.
+        Returns True if roots[i] is exhausted.
+        """
+        self.checkBudget()
+        (newBest, done, newprofiles) = self.process(roots[i])
+        roots.extend(self.makeRoots(newprofiles))
+        self.nexpansions += 1
+        if newBest:
+            self.setBest(newBest)
+        if self.stats:
+            self.stats.tick(self)
+        return done
+
+    def runBestFirst(self, candidates):
+        """
+        Best-first search: always expand the open partial solution with the
+        lowest lower bound (partialSolution.bestMass).  The bound is
+        admissible, so once no open partial solution can beat the best known
+        solution, that solution is optimal for the profiles we were given.
+
+        The frontier can grow huge.  Once it holds maxFrontier partial
+        solutions, we stop adding to it: each partial solution we pop is
+        instead searched depth-first to completion, which needs little
+        memory.
 
+        Returns the best known solution; stops early if the user hits C-c.
+        """
+        frontier = self.frontier
+        def push(candidates):
+            for c in candidates:
+                if self.shouldKeep(c):
+                    heapq.heappush(frontier, (c.bestMass, self.order, c))
+                    self.order += 1
+
+        candidate = None
+        self.startStats()
+        try:
+            push(candidates)
+            if self.checkpoint:
+                self.saveCheckpoint()
+            nexpansionsLastPrinted = self.nexpansions
+            if self.verbose:
+                print ("Starting best-first search of %d configurations"
+                        % len(frontier))
+            while frontier:
+                self.maybeCheckpoint()
+                (bound, order, candidate) = heapq.heappop(frontier)
+                if self.archive is not None:
+                    # A heavier candidate may still have fewer parts.
+                    if not self.shouldKeep(candidate):
+                        candidate = None
+                        continue
+                elif not (candidate < self.bestKnown):
+                    # Nothing left in the frontier can do better.
+                    break
+                if len(frontier) < self.maxFrontier:
+                    push(self.expand(candidate))
+                else:
+                    self.runDepthFirst(candidate)
+                candidate = None
+
+                if self.nexpansions >= nexpansionsLastPrinted + 1000:
+                    nexpansionsLastPrinted = self.nexpansions
+                    if self.verbose:
+                        print ("%d choices considered, %d open, lower bound %g T"
+                                % (self.nexpansions, len(frontier), bound))
+
+            if self.verbose:
+                print ("Completed search after %d evaluations, %d transpositions pruned; "
+                       "the design is optimal for these profiles"
+                        % (self.nexpansions, self.ntranspositions))
+        except (KeyboardInterrupt, SearchBudgetException), e:
+            if candidate is not None:
+                # Put back what we were working on, to redo on resume.
+                heapq.heappush(frontier, (bound, order, candidate))
+            if self.checkpoint:
+                self.saveCheckpoint()
+            if self.verbose:
+                print ("%s search after %d evaluations, %d still open"
+                        % ("Cancelled" if isinstance(e, KeyboardInterrupt)
+                            else "Out of budget; stopped",
+                           self.nexpansions, len(frontier)))
+                if self.checkpoint:
+                    print ("Saved the search to %s" % self.checkpoint)
+            elif isinstance(e, KeyboardInterrupt):
+                raise
+        finally:
+            self.finishStats()
+        return self.bestKnown
+
+    def runDepthFirst(self, candidate):
+        """
+        Search the completions of the candidate depth-first, lightest child
+        first.  Memory use is just the stack.
+        """
+        stack = [ candidate ]
+        while stack:
+            partial = stack.pop()
+            if not self.shouldKeep(partial): continue
+            stack.extend(reversed(self.expand(partial)))
 
+    def expand(self, partial):
+        """
+        Step for the best-first and depth-first searches: a complete partial
+        solution is checked against the best known solution, an incomplete
+        one is extended.  Returns the children, if any.
+        """
+        self.checkBudget()
+        if partial.complete:
+            (newBest, profiles) = self.improve(partial)
+            if newBest:
+                self.setBest(newBest)
+            return self.makeCandidates(profiles)
+        if self.isTransposition(partial):
+            return []
+        self.nexpansions += 1
+        if self.stats:
+            self.stats.tick(self)
+        return partial.extend()
+
+
+# Each worker process of a parallel search gets its own designSearch, which
+# lives across all the roots the worker handles.  It is inherited over fork,
+# so the analyst and the burns need not be picklable.
+_workerSearch = None
+
+def _initWorker(search):
+    global _workerSearch
+    # The parent handles C-c, and terminates the workers.
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    _workerSearch = search
+
+def _searchRoot(task):
+    """
+    Exhaust the search under one (profile, symmetry, towers) root.  Returns
+    the task index and the best stages found, or None if the search didn't
+    improve on the best solution this worker already knew about.
+    """
+    (taskIdx, profile, symmetry, numBase) = task
+    search = _workerSearch
+    before = search.bestKnown
+    bestKnown = search.searchCandidates(
+            [ partialSolution(profile, nil, symmetry, numBase) ])
+    if bestKnown is before or not isinstance(bestKnown, partialSolution):
+        return (taskIdx, None)
+    return (taskIdx, bestKnown.stages)
+
+def _searchInParallel(profiles, massToBeat, analyst, symmetries,
+        numBaseTowers, processes, strategy, verbose = True):
+    """
+    Spread the roots of the search over a pool of processes.  Workers share
+    the best known mass through shared memory, so that any of them finding a
+    good solution tightens the pruning in all of them.
+
+    Returns the best known solution, like designSearch.run.  Its launch mass
+    is the one the search in one process finds; but of several designs with
+    that mass, which one we return depends on the order the workers get to
+    them.
+    """
+    sharedBest = multiprocessing.RawValue('d', float("inf"))
+    sharedLock = multiprocessing.Lock()
+    search = designSearch(symmetries, numBaseTowers, massToBeat, analyst,
+            sharedBest = sharedBest, sharedLock = sharedLock, verbose = False,
+            strategy = strategy)
+    # Profiles may be generated lazily, so we don't know how many tasks
+    # there are until we've handed them all out.
+    tasks = ( (i,) + task for (i, task) in enumerate(
+        (profile, symmetry, numBase)
+        for profile in profiles
+        for (symmetry, numBase) in zip(symmetries, numBaseTowers) ))
+
+    # The parent only keeps track of the best solution, and reports on it.
+    best = designSearch(symmetries, numBaseTowers, massToBeat, analyst,
+            verbose = verbose)
+    bestIdx = None
+    pool = multiprocessing.Pool(processes, _initWorker, (search,))
+    if verbose:
+        print ("Starting to search in %d processes" % processes)
+    ndone = 0
     try:
-        roots = makeRoots(profiles)
-        nexpansions = 0
-        nexpansionsLastPrinted = 0
-        print ("Starting to search %d configurations" % (len(roots)))
-        while(len(roots)):
-            # Make a pass over all the roots, expanding them one step further.
-            # Any suggested new profiles will be appended, and therefore
-            # processed later in the loop.
-            # Don't iterate; use the indices, so it's understandable what is
-            # going on as we change the roots during the loop.
-            j = 0
-            n = len(roots)
-            for i in xrange(len(roots)):
-                (newBest, done, newprofiles) = process(roots[i])
-                roots.extend(makeRoots(newprofiles))
-                nexpansions += 1
-                if newBest:
-                    bestKnown = newBest
-                if not done:
-                    # We keep this one by copying it to the last unused
-                    # location (which is, usually, i)
-                    roots[j] = roots[i]
-                    j += 1
-                # If we added this profile this round, pick at it a bunch more:
-                # once per root we had before starting.  Otherwise it takes
-                # forever and a day to do any searching around that new
-                # part of the solution space.
-                if i > n:
-                    for _ in xrange(n):
-                        (newBest, done, newprofiles) = process(roots[i])
-                        roots.extend(makeRoots(newprofiles))
-                        nexpansions += 1
-                        if newBest:
-                            bestKnown = newBest
-                        if done: break
-            del roots[j:]
-
-            # let the user know things are moving along
-            if nexpansions >= nexpansionsLastPrinted + 1000:
-                nexpansionsLastPrinted = nexpansions
-                print ("%d choices considered, %d avenues remain"
-                        % (nexpansions, len(roots)) )
-
-        print ("Completed search after %d evaluations" % nexpansions)
+        results = pool.imap_unordered(_searchRoot, tasks)
+        while True:
+            try:
+                # Waiting with a timeout lets C-c through.
+                (taskIdx, stages) = results.next(60)
+            except multiprocessing.TimeoutError:
+                continue
+            except StopIteration:
+                break
+            ndone += 1
+            if stages is not None:
+                candidate = partialSolution(None, stages)
+                # Of the designs reported with the same mass, keep the one
+                # from the earliest root.  A worker doesn't report a design
+                # no lighter than one it found before, so that need not be
+                # the earliest root of all with the mass.
+                if (candidate < best.bestKnown or
+                        (isinstance(best.bestKnown, partialSolution)
+                         and candidate.bestMass == best.bestKnown.bestMass
+                         and taskIdx < bestIdx)):
+                    best.bestKnown = candidate
+                    bestIdx = taskIdx
+                    best.report(candidate)
+            if verbose and ndone % 100 == 0:
+                print ("%d configurations searched" % ndone)
+        pool.close()
+        if verbose:
+            print ("Completed search of %d configurations" % ndone)
     except KeyboardInterrupt:
-        print ("Cancelled search after %d evaluations" % nexpansions)
+        pool.terminate()
+        if verbose:
+            print ("Cancelled search after %d configurations" % ndone)
+    pool.join()
+    return best.bestKnown
+
+
+def designRocket(profiles, massToBeat = None,
+        analyst = None, symmetries = 2, numBaseTowers = 1, processes = None,
+        strategy = "iterative", checkpoint = None, checkpointInterval = 300,
+        stats = None, pareto = False, scheduler = None, verbose = True):
+    """
+    Search for the lightest rocket that flies one of the given profiles.
+    The profiles may be any iterable, including a generator such as the one
+    splitBurns returns.
+
+    strategy is "iterative" or "bestfirst"; see designSearch.  scheduler
+    shares out the iterative search in one process over the profiles; see
+    priorityScheduler.
+
+    If processes is more than 1, the search is spread over that many worker
+    processes, one root (profile and symmetry pair) at a time.  It finds a
+    rocket of the same launch mass, though maybe not the same rocket.
+
+    If checkpoint names a file, the search is saved to it every
+    checkpointInterval seconds and on C-c; see resumeRocket.  Only a search
+    in one process can be checkpointed.
+
+    stats is a telemetry.searchStats to collect statistics on the search
+    in, again only in one process.
+
+    If pareto is True, search (in one process) for the trade-off between
+    launch mass, engine count and tower count instead: return the list of
+    the stages of each design on the Pareto front, lightest first.  Pass
+    several symmetries and base tower counts to cover them all in one go.
+
+    Unless verbose, the search prints nothing.
+    """
+    if isinstance(symmetries, Number): symmetries = (symmetries,)
+    if isinstance(numBaseTowers, Number): numBaseTowers = (numBaseTowers,)
+    assert len(symmetries) == len(numBaseTowers)
+
+    if processes is not None and processes > 1:
+        if checkpoint or stats or pareto:
+            raise ValueError("can't checkpoint, collect statistics on, or "
+                    "find the Pareto front with a search in %d processes"
+                    % processes)
+        bestKnown = _searchInParallel(profiles, massToBeat, analyst,
+                symmetries, numBaseTowers, processes, strategy, verbose)
+    else:
+        search = designSearch(symmetries, numBaseTowers, massToBeat, analyst,
+                verbose = verbose, strategy = strategy, checkpoint = checkpoint,
+                checkpointInterval = checkpointInterval, stats = stats,
+                pareto = pareto, scheduler = scheduler)
+        bestKnown = search.search(profiles)
+        if pareto:
+            return [ soln.stages for soln in search.archive.front() ]
+
+    return _bestStages(bestKnown)
 
+def resumeRocket(checkpoint, checkpointInterval = 300):
+    """
+    Continue a search that designRocket saved to the checkpoint file, and
+    keep saving it there.  Returns the stages of the best rocket (or the
+    Pareto front), like designRocket, and the analyst the search was started
+    with.
+    """
+    search = designSearch.load(checkpoint)
+    search.checkpoint = checkpoint
+    search.checkpointInterval = checkpointInterval
+    bestKnown = search.resume()
+    if search.archive is not None:
+        return ([ soln.stages for soln in search.archive.front() ],
+                search.analyst)
+    return (_bestStages(bestKnown), search.analyst)
+
+def _bestStages(bestKnown):
     if isinstance(bestKnown, partialSolution):
         return bestKnown.stages
     else:
@@ -852,40 +2113,134 @@ def designRocket(profiles, massToBeat = None,
 # In practice, splitting in 500m/s seems to just take too long on large
 # missions and not actually improve much on small missions.
 #
+def countProfiles(burns, minStageDeltaV):
+    """
+    Return how many profiles splitBurns will generate.
+    """
+    n = 1
+    for b in burns:
+        n *= int(math.ceil(b.deltaV / minStageDeltaV))
+    return n
+
+def idealMass(burns):
+    """
+    Lower bound on the launch mass of any rocket for the burns (bottom
+    first), however they are split into stages: the rocket equation at the
+    best Isp of any engine, lifting nothing but the payloads -- no engines,
+    tanks or decouplers.  Very loose, but it holds for every profile.
+    """
+    Isp = max(max(e.IspAtm, e.IspVac) for e in engine.types)
+    mass = 0
+    for b in reversed(burns):
+        mass = (mass + b.payload) * engine.alpha(b.deltaV, Isp)
+    return mass
+
+class profileStream(object):
+    """
+    Generate the burn profiles, lazily, most promising first.
+
+    A profile is given by the number of stages we split each burn into.  We
+    walk that lattice from the least split profile up, always yielding the
+    profile with the lowest bound on the launch mass among those we've
+    reached (the bound is not monotonic in the number of splits, so this is
+    only roughly the most promising order).  Memory and time are
+    proportional to the number of profiles pulled, not the number there are.
+
+    This is an iterator object rather than a generator so that a search
+    checkpoint can pickle it.
+    """
+    def __init__(self, burns, minStageDeltaV):
+        self.burns = tuple(burns)
+        self.maxSplits = [ int(math.ceil(b.deltaV / minStageDeltaV)) for b in burns ]
+
+        # Each split of each burn appears in many profiles, and converting is
+        # expensive: liftoff burns interpolate along the ascent, and the best
+        # Isp is a search over the engines.  Do each one once.
+        self.converted = {}
+
+        self.frontier = []
+        self.seen = set()
+        self.numProfiles = 0
+        if self.burns and min(self.maxSplits) >= 1:
+            start = (1,) * len(self.burns)
+            self.frontier.append(self._makeProfile(start))
+            self.seen.add(start)
+            self.numProfiles = countProfiles(self.burns, minStageDeltaV)
+        self.idealMass = idealMass(self.burns)
+
+    def _convert(self, burnIdx, n):
+        key = (burnIdx, n)
+        if key not in self.converted:
+            # top-first order, as the profile wants it
+            subburns = tuple(reversed(self.burns[burnIdx].convert(n)))
+            maxIsp = tuple( engine.maxIsp(b.planet, b.altitude if b.planet else None)
+                    for b in subburns )
+            self.converted[key] = (subburns, maxIsp)
+        return self.converted[key]
+
+    def _makeProfile(self, splits):
+        # The burns come bottom-first, but the profile is top-first.
+        rawburns = []
+        maxIsp = []
+        for burnIdx in reversed(xrange(len(self.burns))):
+            (subburns, isps) = self._convert(burnIdx, splits[burnIdx])
+            rawburns.extend(subburns)
+            maxIsp.extend(isps)
+        profile = burnProfile(rawburns, maxIsp)
+        return (profile.lowerBound(), splits, profile)
+
+    def lowerBound(self):
+        """
+        Lower bound on the launch mass of any rocket flying a profile we
+        have yet to yield, or infinity if there are none.  For the profiles
+        we've reached, that's the least of their bounds.  The bound isn't
+        monotonic in the number of splits, so the profiles we haven't
+        reached could do better than those: until we've reached them all,
+        they're bounded by the ideal rocket (see idealMass).
+        """
+        bound = self.frontier[0][0] if self.frontier else float("inf")
+        if len(self.seen) < self.numProfiles:
+            bound = min(bound, self.idealMass)
+        return bound
+
+    def __iter__(self):
+        return self
+
+    def next(self):
+        if not self.frontier:
+            raise StopIteration
+        (_, splits, profile) = heapq.heappop(self.frontier)
+        for i in xrange(len(splits)):
+            if splits[i] < self.maxSplits[i]:
+                nextSplits = splits[:i] + (splits[i] + 1,) + splits[i+1:]
+                if nextSplits not in self.seen:
+                    self.seen.add(nextSplits)
+                    heapq.heappush(self.frontier, self._makeProfile(nextSplits))
+        return profile
+
 def splitBurns(burns, minStageDeltaV):
-    profiles = []
-    # subburns are rawburn instances, but stored in a cons list, so they're in
-    # top-first order rather than bottom-first.  This is conveniently how all
-    # the internal code wants it.
-    def recur(subburns, burnIdx):
-        if burnIdx == len(burns):
-            # Base case:
-            # convert the subburns to a complete burn profile
-            profile = burnProfile(subburns)
-            profiles.append(profile)
-        else:
-            # Inductive case: for every split of burn i, recur.
-            b = burns[burnIdx]
-            maxstages = int(math.ceil(b.deltaV / minStageDeltaV)) # max number of splits
-            for nstages in xrange(1, maxstages+1):
-                mysubburns = subburns
-                for subb in b.convert(nstages):
-                    mysubburns = cons(subb, mysubburns)
-                recur(mysubburns, burnIdx + 1)
-
-    recur(nil, 0)
-    return profiles
+    """
+    Return an iterator over the burn profiles, most promising first; see
+    profileStream.
+    """
+    return profileStream(burns, minStageDeltaV)
 
 # Local search trick, and pretty printing.
 class analyst(object):
-    def __init__(self, burns, minStageDeltaV):
+    verbose = True
+
+    def __init__(self, burns, minStageDeltaV, verbose = True):
         """
         Set up, relative to the *original* burns that the user wants.
         Said burns are ordered bottom up.
+
+        Unless verbose, the analyst doesn't print its progress (prettyPrint
+        still prints).
         """
         self.burns = burns
         self.totalDeltaV = sum(b.deltaV for b in self.burns)
         self.minStageDeltaV = minStageDeltaV
+        self.verbose = verbose
 
     class stageData(object):
         def __init__(self, burnIds, dumpDV, payload):
@@ -984,6 +2339,63 @@ class analyst(object):
         return data
 
 
+    def flies(self, stages):
+        """
+        Return True if the stages (bottom up) can fly all the burns: each
+        has enough vectoring thrust, and the deltaV adds up, counting only
+        stages with enough acceleration for the burn they're on.
+        """
+        burnIdx = 0
+        burndV = self.burns[0].deltaV
+        for s in stages:
+            if s.vectoringThrust < 0.25 * s.thrust:
+                return False
+            dV = s.achievedDeltaV()
+            while burnIdx < len(self.burns) and dV > 0:
+                if s.acceleration() < self.burns[burnIdx].acceleration:
+                    break
+                if dV < burndV - 1e-3:
+                    burndV -= dV
+                    break
+                # Complete the burn (perhaps missing by 1mm/s).
+                dV -= burndV
+                burnIdx += 1
+                if burnIdx < len(self.burns):
+                    burndV = self.burns[burnIdx].deltaV
+        return burnIdx == len(self.burns)
+
+    def rebuild(self, stages, couplerMasses = None):
+        """
+        Rebuild a design, perhaps made for other payloads, for our burns:
+        the same engines and towers on each stage, and the same target
+        deltaV, but with the propellant resized for the mass it now lifts.
+
+        couplerMasses lists, bottom up, the mass of the couplers each stage
+        lifts besides its payload (see _engineCounts); the stages don't
+        say.  By default, the stages have none.
+
+        Returns the new stages, bottom up, or None if they don't fly (see
+        flies).
+        """
+        analysis = self.analyze(stages)
+        if couplerMasses is None:
+            couplerMasses = [ 0 ] * len(analysis)
+        newStages = nil
+        for (s, d, couplerMass) in reversed(zip(stages, analysis, couplerMasses)):
+            laterEngines = stage.collectUsableEngines(newStages) if s.asparagus else None
+            payload = (d.payload + couplerMass
+                    + (newStages.head.fullMass if newStages else 0))
+            try:
+                newS = stage(s.targetDeltaV, payload, s.engineType,
+                        s.numEngines, laterEngines, s.numTowers, s.planet,
+                        s.altitude)
+            except engine.WeakEngineException:
+                return None
+            newStages = cons(newS, newStages)
+        if not self.flies(newStages):
+            return None
+        return newStages
+
     def _locallyImprove(self, stages, analysis):
         """
         Rebuild the stages, trying to reduce capacity to drop wasted
@@ -1084,8 +2496,9 @@ class analyst(object):
 
 
         if newStages.head.fullMass < stages.head.fullMass:
-            print ("Locally improved from %g T to %g T" %
-                    (stages.head.fullMass, newStages.head.fullMass))
+            if self.verbose:
+                print ("Locally improved from %g T to %g T" %
+                        (stages.head.fullMass, newStages.head.fullMass))
             return newStages
 
     def _suggestDeltaVs(self, stages):
@@ -1216,7 +2629,10 @@ class analyst(object):
                 print ("\t* includes %g T payload" % d.payload)
 
 
-def design(burns, minStageDeltaV = 750, symmetry = 2, numBaseTowers = 1):
+def design(burns, minStageDeltaV = 750, symmetry = 2, numBaseTowers = 1,
+        processes = None, strategy = "iterative", checkpoint = None,
+        checkpointInterval = 300, stats = None, pareto = False,
+        designFile = None, scheduler = None):
     """
     Design a rocket to perform the given burns, instances of liftoffBurn and
     deepSpaceBurn.  Prints to stdout.
@@ -1231,26 +2647,332 @@ def design(burns, minStageDeltaV = 750, symmetry = 2, numBaseTowers = 1):
         any stage with more than 750 m/s dV into a variety of numbers of
         smaller stages.
         It is probably a bad algorithm...
+
+    processes says how many processes to search with.  By default, we search
+        in this process only.
+
+    strategy is "iterative" (the default) for a round-robin iterative
+        deepening search that finds decent designs early, or "bestfirst" for
+        a best-first search that finishes sooner with a design proven
+        optimal for the profiles.
+
+    scheduler decides how the iterative search shares its time among the
+        profiles: by default, the same for each, but pass a
+        priorityScheduler() to favour the most promising.
+
+    checkpoint names a file to save the search to, every checkpointInterval
+        seconds and when you hit C-c.  Pick the search up again with resume.
+
+    stats is a telemetry.searchStats to collect statistics on the search in,
+        e.g. telemetry.searchStats(trace = "search.jsonl") to trace it to a
+        file.
+
+    pareto says to design the whole trade-off curve of launch mass against
+        engine and tower count, rather than just the lightest rocket.
+        Give several symmetries and base tower counts (as tuples of the
+        same length) to compare them all in one search.
+
+    designFile names a file to keep the best design in (see saveDesign).
+        If it holds a design for this mission, or for a similar one, that
+        still flies, the search starts out with it as the rocket to beat;
+        and the best design is saved back to it at the end.
     """
+    if pareto and designFile:
+        raise ValueError("can't seed the search for a Pareto front from a "
+                "design file")
     print ("Designing for burns totalling %g m/s, payload total %g T" %
         (sum(b.deltaV for b in burns),
          sum(b.payload for b in burns)))
+    print ("%d Profiles" % countProfiles(burns, minStageDeltaV))
     profiles = splitBurns(burns, minStageDeltaV)
-    print ("%g Profiles:" % (len(profiles)))
-    for p in profiles:
-        print str(p)
     shrink = analyst(burns, minStageDeltaV)
+    seed = None
+    if designFile and os.path.exists(designFile):
+        seed = loadDesign(designFile, burns, minStageDeltaV, symmetry,
+                numBaseTowers)
+        if seed is None:
+            print ("The design in %s doesn't fit this mission; ignoring it"
+                    % designFile)
+        else:
+            print ("Starting from the %g T design in %s"
+                    % (seed.head.fullMass, designFile))
+            seed = partialSolution(None, seed)
 
     # This code takes a long, long time...  Hit C-c at the shell to stop it and
     # return the best yet.
     soln = designRocket(profiles,
-                massToBeat = None,
+                massToBeat = seed,
                 analyst = shrink,
                 symmetries = symmetry,
-                numBaseTowers = numBaseTowers)
-
-    if soln:
+                numBaseTowers = numBaseTowers,
+                processes = processes,
+                strategy = strategy,
+                checkpoint = checkpoint,
+                checkpointInterval = checkpointInterval,
+                stats = stats,
+                pareto = pareto,
+                scheduler = scheduler)
+    if designFile and soln:
+        saveDesign(designFile, burns, soln, minStageDeltaV, symmetry,
+                numBaseTowers)
+    _printDesign(soln, shrink)
+
+def resume(checkpoint, checkpointInterval = 300):
+    """
+    Continue designing from a checkpoint that design saved.  Prints to stdout.
+    """
+    print ("Resuming the search saved in %s" % checkpoint)
+    (soln, shrink) = resumeRocket(checkpoint, checkpointInterval)
+    _printDesign(soln, shrink)
+
+def _printDesign(soln, shrink):
+    print ("Stage memo: %d hits, %d misses" % (stageMemo.hits, stageMemo.misses))
+
+    if isinstance(soln, list):
+        # A Pareto front.
+        print ("%d designs on the Pareto front:" % len(soln))
+        for stages in soln:
+            (mass, engines, towers) = partialSolution(None, stages).objectives()
+            print ("  %g T, %d engines, %d towers in %d stages"
+                    % (mass, engines, towers, len(stages)))
+        for stages in soln:
+            shrink.prettyPrint(stages, shrink.analyze(stages))
+    elif soln:
         data = shrink.analyze(soln)
         shrink.prettyPrint(soln, data)
     else:
         print "You will not be going to space today."
+
+
+# Design files keep the best rocket for a mission between runs, so the next
+# search starts out pruning against it.  They hold just enough to rebuild the
+# stages: the engines, towers and target deltaV of each, and the payload it
+# carries over the stages above, couplers included.  The coupler mass is
+# also recorded on its own, since a design rebuilt for other payloads still
+# needs the couplers.  The other masses are only recorded for reference; we
+# recompute them against the current engine catalog when loading.
+_designFileVersion = 2
+
+def _missionHash(burns, minStageDeltaV, symmetry, numBaseTowers):
+    """
+    Hash the inputs of a mission: the burns and the search options that
+    change what designs we can find.
+    """
+    if isinstance(symmetry, Number): symmetry = (symmetry,)
+    if isinstance(numBaseTowers, Number): numBaseTowers = (numBaseTowers,)
+    description = {
+        'burns': [ (type(b).__name__, b.name, b.deltaV, b.acceleration,
+                    b.payload, str(getattr(b, 'planet', None)))
+                   for b in burns ],
+        'minStageDeltaV': minStageDeltaV,
+        'symmetry': list(symmetry),
+        'numBaseTowers': list(numBaseTowers),
+    }
+    return hashlib.sha1(json.dumps(description, sort_keys = True)).hexdigest()
+
+def saveDesign(filename, burns, stages, minStageDeltaV = 750, symmetry = 2,
+        numBaseTowers = 1):
+    """
+    Save the stages (bottom up) of a design for the burns to a design file,
+    for loadDesign.  The file is replaced atomically.
+    """
+    if isinstance(symmetry, Number): symmetry = (symmetry,)
+    if isinstance(numBaseTowers, Number): numBaseTowers = (numBaseTowers,)
+    analysis = analyst(burns, minStageDeltaV, verbose = False).analyze(stages)
+    records = []
+    for (s, above, d) in zip(stages, list(stages)[1:] + [None], analysis):
+        payload = s.payload - (above.fullMass if above else 0)
+        records.append({
+            'engine':       s.engineType.name,
+            'numEngines':   s.numEngines,
+            'numTowers':    s.numTowers,
+            'asparagus':    s.asparagus,
+            'deltaV':       s.targetDeltaV,
+            'payload':      payload,
+            'couplerMass':  payload - d.payload,
+            'planet':       s.planet.name if s.planet else None,
+            'altitude':     s.altitude,
+            'mass':         s.fullMass,
+        })
+    design = {
+        'version':          _designFileVersion,
+        'mission':          _missionHash(burns, minStageDeltaV, symmetry,
+                                numBaseTowers),
+        'symmetry':         list(symmetry),
+        'numBaseTowers':    list(numBaseTowers),
+        'mass':             stages.head.fullMass,
+        'stages':           records,
+    }
+    tmpname = filename + ".tmp"
+    with open(tmpname, "w") as f:
+        json.dump(design, f, indent = 1, sort_keys = True)
+        f.write("\n")
+        f.flush()
+        os.fsync(f.fileno())
+    os.rename(tmpname, filename)
+
+def loadDesign(filename, burns, minStageDeltaV = 750, symmetry = 2,
+        numBaseTowers = 1):
+    """
+    Load a design that saveDesign saved, and check it against the current
+    engine catalog and the burns.  The design may have been made for another
+    mission, say with other payloads: we rebuild it for these burns (see
+    analyst.rebuild).  The symmetry and base towers must match, though.
+
+    Returns the stages, bottom up, or None if the file is out of date or the
+    rocket doesn't fly.
+    """
+    if isinstance(symmetry, Number): symmetry = (symmetry,)
+    if isinstance(numBaseTowers, Number): numBaseTowers = (numBaseTowers,)
+    with open(filename) as f:
+        design = json.load(f)
+    if design.get('version') != _designFileVersion:
+        return None
+    if (tuple(design['symmetry']) != tuple(symmetry) or
+            tuple(design['numBaseTowers']) != tuple(numBaseTowers)):
+        return None
+
+    # Build the stages top down, as the search does.
+    stages = nil
+    try:
+        for r in reversed(design['stages']):
+            engineType = engine.getEngine(r['engine'])
+            body = planet.getPlanet(r['planet']) if r['planet'] else None
+            laterEngines = (stage.collectUsableEngines(stages)
+                    if r['asparagus'] else None)
+            payload = r['payload'] + (stages.head.fullMass if stages else 0)
+            s = stage(r['deltaV'], payload, engineType, r['numEngines'],
+                    laterEngines, r['numTowers'], body, r['altitude'])
+            stages = cons(s, stages)
+    except (KeyError, engine.WeakEngineException):
+        # An engine or planet we no longer know about, or that can't lift
+        # the stage any more.
+        return None
+    if not stages:
+        return None
+
+    shrink = analyst(burns, minStageDeltaV, verbose = False)
+    if design['mission'] == _missionHash(burns, minStageDeltaV, symmetry,
+            numBaseTowers):
+        return stages if shrink.flies(stages) else None
+    return shrink.rebuild(stages,
+            [ r['couplerMass'] for r in design['stages'] ])
+
+
+class designResult(object):
+    """
+    What designWithin found:
+    * stages: the best rocket, bottom-up, or None if we found none
+    * mass: its launch mass in tonnes, or None
+    * lowerBound: a lower bound on the launch mass of any rocket for the
+        profiles.  If the search completed, it's the mass.  Otherwise it can
+        be very loose (see designSearch.lowerBound).
+    * complete: True if the search finished inside the budget
+    * nexpansions, elapsed: the effort spent, in expansions and seconds
+    """
+    def __init__(self, stages, lowerBound, complete, nexpansions, elapsed):
+        self.stages = stages
+        self.mass = stages.head.fullMass if stages else None
+        self.lowerBound = lowerBound
+        self.complete = complete
+        self.nexpansions = nexpansions
+        self.elapsed = elapsed
+
+    def gap(self):
+        """
+        How much lighter than ours the best rocket could be, at most, in
+        tonnes; None if we have no rocket.  Zero if the search completed.
+        """
+        if self.stages is None: return None
+        return max(0, self.mass - self.lowerBound)
+
+    def __str__(self):
+        if self.stages is None:
+            return ("no design after %d expansions in %g s"
+                    % (self.nexpansions, self.elapsed))
+        return ("%g T design in %d stages, at most %g T from optimal, "
+                "after %d expansions in %g s"
+                % (self.mass, len(self.stages), self.gap(),
+                   self.nexpansions, self.elapsed))
+
+def designWithin(burns, minStageDeltaV = 750, symmetry = 2, numBaseTowers = 1,
+        strategy = "iterative", timeLimit = None, maxExpansions = None,
+        onImprove = None, massToBeat = None, stats = None, scheduler = None):
+    """
+    Like design, but as a library call: searches quietly in this process,
+    stops after timeLimit seconds or maxExpansions expansions (whichever
+    comes first; by default, neither), and returns a designResult.
+
+    onImprove, if given, is called with the stages of each better rocket as
+    the search finds it.  stats, if given, is a telemetry.searchStats.
+    scheduler is as for design.
+
+    The search stops between expansions, so it can overrun the time limit by
+    the time of one expansion.
+    """
+    start = time.time()
+    if isinstance(symmetry, Number): symmetry = (symmetry,)
+    if isinstance(numBaseTowers, Number): numBaseTowers = (numBaseTowers,)
+    assert len(symmetry) == len(numBaseTowers)
+
+    deadline = start + timeLimit if timeLimit is not None else None
+    search = designSearch(symmetry, numBaseTowers, massToBeat,
+            analyst(burns, minStageDeltaV, verbose = False),
+            verbose = False, strategy = strategy, deadline = deadline,
+            maxExpansions = maxExpansions, onImprove = onImprove,
+            stats = stats, scheduler = scheduler)
+    bestKnown = search.search(splitBurns(burns, minStageDeltaV))
+
+    stages = _bestStages(bestKnown)
+    complete = not search.outOfBudget
+    lowerBound = bestKnown.bestMass if complete and stages else search.lowerBound()
+    return designResult(stages, lowerBound, complete, search.nexpansions,
+            time.time() - start)
+
+def designSweep(missions, minStageDeltaV = 750, symmetry = 2,
+        numBaseTowers = 1, strategy = "iterative", slack = 1.05,
+        timeLimit = None, maxExpansions = None):
+    """
+    Design rockets for a series of related missions -- typically the same
+    burns with a range of payloads -- in one process, quietly.  Returns a
+    designResult for each mission, in order.
+
+    Each mission after the first is seeded with the launch mass of the last
+    design, scaled by the ratio of the payloads and padded by slack, so the
+    search prunes anything heavier from the first expansion.  If that turns
+    out too tight to find anything, we search again without a seed.  The
+    stage designs (stageMemo), engine Isps and climb slopes are cached
+    across the missions, too.
+
+    Don't expect much of either.  On the lko-100 sweep below, the search's
+    own greedy designs beat the seed within half a second, and the missions
+    share few stages; the sweep takes as long as separate runs.
+
+    timeLimit and maxExpansions apply to each search; see designWithin.
+
+    For instance, to size the lko-100.py launcher for a range of payloads:
+        missions = [ (rockets.liftoffBurn("Depart Kerbin", planet.kerbin,
+                            orbit = 100000, payload = p),
+                      rockets.deepSpaceBurn("De-orbit", 500, payload = 0.08))
+                     for p in xrange(20, 121, 20) ]
+        for result in rockets.designSweep(missions, minStageDeltaV = 250,
+                symmetry = 4):
+            print result
+    """
+    results = []
+    previous = None # (payload, mass) of the last design
+    for burns in missions:
+        payload = sum(b.payload for b in burns)
+        seed = None
+        if previous is not None and previous[0] > 0 and payload > 0:
+            (previousPayload, previousMass) = previous
+            seed = previousMass * payload / previousPayload * slack
+        result = designWithin(burns, minStageDeltaV, symmetry, numBaseTowers,
+                strategy, timeLimit, maxExpansions, massToBeat = seed)
+        if result.stages is None and seed is not None:
+            result = designWithin(burns, minStageDeltaV, symmetry,
+                    numBaseTowers, strategy, timeLimit, maxExpansions)
+        if result.stages is not None:
+            previous = (payload, result.mass)
+        results.append(result)
+    return results
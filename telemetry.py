@@ -0,0 +1,171 @@
+# KSP Rocket design search telemetry.
+# Copyright 2012 Benoit Hudson
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+"""
+Counters and timers for the rocket design search (see rockets.designSearch),
+to tell where a search spends its time on a given mission.
+"""
+from __future__ import division
+
+import json
+import time
+
+
+class searchStats(object):
+    """
+    Statistics of one search.  The search bumps the counters and timers as
+    it goes; every `interval` seconds, and on each improvement, a snapshot
+    (see snapshot) is passed to the callback and written as one JSON line to
+    the trace file, if we have them.
+
+    trace may be a file name or an open file.  A file we open ourselves is
+    closed when the search finishes, or on leaving a with block.
+
+    The lower bound of the search is costly to work out, so progress
+    snapshots only refresh it every boundInterval seconds; improvements and
+    the finish always do.
+    """
+    def __init__(self, callback = None, trace = None, interval = 1,
+            boundInterval = 10):
+        self.callback = callback
+        self.ownsTrace = isinstance(trace, basestring)
+        if self.ownsTrace:
+            trace = open(trace, "w")
+        self.trace = trace
+        self.interval = interval
+        self.boundInterval = boundInterval
+        self.bound = None
+        self.lastBound = None
+
+        self.start = time.time()
+        self.lastReport = self.start
+
+        # Counted by the search.
+        self.kept = 0           # shouldKeep said yes
+        self.pruned = 0         # shouldKeep said no
+        self.extends = 0        # calls to partialSolution.extend
+        self.children = 0       # partial solutions they returned
+        self.dominated = 0      # options they dropped as no better than others
+        self.retired = 0        # roots dropped by their current bound
+
+        # Seconds spent, and number of calls, by what was timed.
+        self.timers = {}
+
+        # (seconds since start, launch mass) at each improvement.
+        self.history = []
+
+    def addTime(self, name, seconds):
+        timer = self.timers.get(name)
+        if timer is None:
+            self.timers[name] = [ seconds, 1 ]
+        else:
+            timer[0] += seconds
+            timer[1] += 1
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        """
+        Close the trace file, if we opened it.
+        """
+        if self.ownsTrace and self.trace:
+            self.trace.close()
+            self.trace = None
+
+    def lowerBound(self, search, fresh = True):
+        """
+        The lower bound of the search, as of at most boundInterval seconds
+        ago unless fresh.
+        """
+        now = time.time()
+        if (fresh or self.lastBound is None
+                or now >= self.lastBound + self.boundInterval):
+            self.bound = search.lowerBound()
+            self.lastBound = now
+        return self.bound
+
+    def snapshot(self, search, fresh = True):
+        """
+        Return a dict of the statistics so far.  Unless fresh, the lower
+        bound may be a few seconds old.
+        """
+        elapsed = time.time() - self.start
+        nkeep = self.kept + self.pruned
+        if search.bestKnown is not None and hasattr(search.bestKnown, 'bestMass'):
+            bestMass = search.bestKnown.bestMass
+        else:
+            bestMass = None
+        lowerBound = self.lowerBound(search, fresh)
+        if lowerBound == float("inf"): lowerBound = None
+        return {
+            'elapsed':              elapsed,
+            'expansions':           search.nexpansions,
+            'expansionsPerSecond':  search.nexpansions / elapsed if elapsed else 0,
+            'kept':                 self.kept,
+            'pruned':               self.pruned,
+            'pruneRate':            self.pruned / nkeep if nkeep else 0,
+            'retired':              self.retired,
+            'open':                 (len(search.frontier) +
+                                     sum(len(children) for root in search.roots
+                                                       for children in root.stack)),
+            'transpositions':       search.ntranspositions,
+            'completionsReused':    search.ncompletionsReused,
+            'extends':              self.extends,
+            'branchingFactor':      self.children / self.extends if self.extends else 0,
+            'dominated':            self.dominated,
+            'timers':               dict( (name, { 'seconds': t, 'calls': n })
+                                        for (name, (t, n)) in self.timers.iteritems() ),
+            'bestMass':             bestMass,
+            'lowerBound':           lowerBound,
+            'gap':                  (bestMass - lowerBound
+                                        if bestMass is not None and lowerBound is not None
+                                        else None),
+        }
+
+    def report(self, search, event):
+        """
+        Pass a snapshot to the callback and the trace file.
+        """
+        self.lastReport = time.time()
+        if not self.callback and not self.trace:
+            return
+        snap = self.snapshot(search, fresh = event != "progress")
+        snap['event'] = event
+        if self.callback:
+            self.callback(snap)
+        if self.trace:
+            self.trace.write(json.dumps(snap, sort_keys = True))
+            self.trace.write("\n")
+            self.trace.flush()
+
+    def tick(self, search):
+        """
+        Called after each expansion; reports every interval seconds.
+        """
+        if time.time() >= self.lastReport + self.interval:
+            self.report(search, "progress")
+
+    def improved(self, search):
+        self.history.append( (time.time() - self.start, search.bestKnown.bestMass) )
+        self.report(search, "improvement")
+
+    def finish(self, search):
+        self.report(search, "finish")
+        self.close()
@@ -0,0 +1,68 @@
+# Tests for the rocket design search.
+# Copyright 2012 Benoit Hudson
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Run with: python -m unittest test_rockets
+"""
+
+import os
+import shutil
+import tempfile
+import unittest
+
+import engine
+import rockets
+from LinkedList import cons, nil
+
+
+class designFileTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.filename = os.path.join(self.dir, "design.json")
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    @staticmethod
+    def couplerDesign(payload):
+        """
+        Two stages of two engines on one tower, so each has a bicoupler.
+        """
+        top = rockets.stage(1000, payload + 0.1, engine.getEngine("LV-T45"),
+                2, None, 1, None, None)
+        bottom = rockets.stage(800, top.fullMass + 0.1,
+                engine.getEngine("LV-T45"), 2, None, 1, None, None)
+        return cons(bottom, cons(top, nil))
+
+    @staticmethod
+    def burns(payload):
+        return ( rockets.deepSpaceBurn("Transfer", 800),
+                 rockets.deepSpaceBurn("Insertion", 1000, payload = payload) )
+
+    def testSameMission(self):
+        stages = self.couplerDesign(5)
+        rockets.saveDesign(self.filename, self.burns(5), stages)
+        loaded = rockets.loadDesign(self.filename, self.burns(5))
+        self.assertAlmostEqual(loaded.head.fullMass, stages.head.fullMass)
+
+    def testRebuildKeepsCouplers(self):
+        rockets.saveDesign(self.filename, self.burns(5), self.couplerDesign(5))
+        loaded = rockets.loadDesign(self.filename, self.burns(8))
+        self.assertAlmostEqual(loaded.head.fullMass,
+                self.couplerDesign(8).head.fullMass)
+
+
+if __name__ == "__main__":
+    unittest.main()